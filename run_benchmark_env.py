@@ -0,0 +1,298 @@
+"""
+Benchmarks the throughput of the reinforcement learning environment (agent.Env) for combinations of levels,
+rendering, motion engines and numbers of parallel environments, saving the results as JSON and CSV files
+(such that performance regressions between versions can be detected)
+"""
+import argparse
+import csv
+import datetime
+import functools
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import List, Optional, Dict, Any
+
+import numpy as np
+import pygame
+
+from game import config
+from game.level import Grid
+from game.level_generator import GridLevelGenerator, syntheticLevelShape
+from game.remote_control import RemoteAction
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+POLICY_RANDOM = "random"
+POLICY_SCRIPTED = "scripted"
+# scripted policy: run and jump to the right, then to the left, with pauses in between (repeated cyclically)
+SCRIPTED_ACTIONS = [RemoteAction.RIGHT] * 10 + [RemoteAction.RIGHT_UP] * 10 + [RemoteAction.RIGHT] * 10 \
+    + [RemoteAction.NONE] * 5 + [RemoteAction.LEFT] * 10 + [RemoteAction.LEFT_UP] * 10 + [RemoteAction.LEFT] * 10 \
+    + [RemoteAction.NONE] * 5
+
+
+class ActionPolicy:
+    """
+    Chooses the actions for the benchmark rollouts
+    """
+    def __init__(self, policy: str, numEnvs: int, seed: int):
+        self.policy = policy
+        self.numEnvs = numEnvs
+        self.actions = list(RemoteAction)
+        self.rand = np.random.RandomState(seed)
+        self.scriptedActionIndices = np.array([self.actions.index(a) for a in SCRIPTED_ACTIONS])
+        if policy not in (POLICY_RANDOM, POLICY_SCRIPTED):
+            raise ValueError(f"Unknown policy '{policy}'")
+
+    def actionIndices(self, step: int) -> np.ndarray:
+        """
+        :param step: the step number
+        :return: the array of action indices for each of the environments
+        """
+        if self.policy == POLICY_RANDOM:
+            return self.rand.randint(len(self.actions), size=self.numEnvs)
+        else:
+            return np.full(self.numEnvs, self.scriptedActionIndices[step % len(self.scriptedActionIndices)])
+
+
+def levelInfo(level: str) -> Dict[str, Any]:
+    grid = Grid(os.path.join(config.levelsPath, level), None)
+    ydim, xdim = grid.shape
+    return {"level": level, "gridHeight": ydim, "gridWidth": xdim, "numCells": ydim * xdim,
+        "numPlatformCells": int((grid.cells == Grid.PLATFORM).sum())}
+
+
+def peakRssMB() -> Dict[str, Optional[float]]:
+    """
+    :return: the peak resident set sizes (in MB) of the current process and of the largest of its (terminated)
+        child processes
+    """
+    if resource is None:
+        return {"peakRssMB": None, "peakWorkerRssMB": None}
+    # ru_maxrss is given in bytes on macOS and in kilobytes on other systems
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {"peakRssMB": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "peakWorkerRssMB": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale}
+
+
+def latencyStats(prefix: str, seconds: List[float]) -> Dict[str, Optional[float]]:
+    if len(seconds) == 0:
+        return {f"{prefix}MeanMs": None, f"{prefix}P50Ms": None, f"{prefix}MaxMs": None}
+    a = np.array(seconds) * 1000
+    return {f"{prefix}MeanMs": float(a.mean()), f"{prefix}P50Ms": float(np.percentile(a, 50)),
+        f"{prefix}MaxMs": float(a.max())}
+
+
+def benchmarkSingleEnv(level: str, enableRendering: bool, fastMotion: bool, actionRepeat: int, policy: ActionPolicy,
+        numSteps: int, numResets: int) -> Dict[str, Any]:
+    from agent import Env
+    from game.game import Game
+
+    t = perf_counter()
+    env = Env(Game([level], enableRendering=enableRendering, fastMotion=fastMotion), actionRepeat=actionRepeat)
+    creationTime = perf_counter() - t
+
+    env.reset()
+    stepTime = 0.0
+    obsTimes = []
+    numEpisodes = 0
+    for i in range(numSteps):
+        actionIdx = int(policy.actionIndices(i)[0])
+        t = perf_counter()
+        _, _, done, _ = env.step(actionIdx)
+        stepTime += perf_counter() - t
+        # measure the observation build time separately (on the same state)
+        t = perf_counter()
+        env.get_obs()
+        obsTimes.append(perf_counter() - t)
+        if done:
+            numEpisodes += 1
+            env.reset()
+
+    resetTimes = []
+    for _ in range(numResets):
+        t = perf_counter()
+        env.reset()
+        resetTimes.append(perf_counter() - t)
+
+    result = {"stepsPerSecond": numSteps / stepTime, "numEpisodes": numEpisodes, "creationTimeS": creationTime}
+    result.update(latencyStats("reset", resetTimes))
+    result.update(latencyStats("obs", obsTimes))
+    return result
+
+
+def benchmarkParallelEnvs(level: str, fastMotion: bool, actionRepeat: int, numEnvs: int, policy: ActionPolicy,
+        numSteps: int, numResets: int) -> Dict[str, Any]:
+    from agent import HeadlessGameFactory, _createWorkerEnv
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+
+    t = perf_counter()
+    gameFactory = HeadlessGameFactory([level], fastMotion=fastMotion)
+    vecEnv = SubprocVecEnv([functools.partial(_createWorkerEnv, gameFactory, i, actionRepeat) for i in range(numEnvs)])
+    vecEnv.reset()
+    creationTime = perf_counter() - t
+
+    try:
+        stepTime = 0.0
+        numEpisodes = 0
+        for i in range(numSteps):
+            actionIndices = policy.actionIndices(i)
+            t = perf_counter()
+            _, _, dones, _ = vecEnv.step(actionIndices)  # environments which are done are reset automatically
+            stepTime += perf_counter() - t
+            numEpisodes += int(dones.sum())
+
+        resetTimes = []
+        for _ in range(numResets):
+            t = perf_counter()
+            vecEnv.reset()
+            resetTimes.append(perf_counter() - t)
+    finally:
+        vecEnv.close()
+
+    result = {"stepsPerSecond": numSteps * numEnvs / stepTime, "numEpisodes": numEpisodes,
+        "creationTimeS": creationTime}
+    result.update(latencyStats("reset", resetTimes))
+    result.update(latencyStats("obs", []))  # observations are built in the worker processes
+    return result
+
+
+def runConfiguration(configuration: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Runs the benchmark for a single configuration (intended to be called in a fresh process, such that the peak
+    memory usage refers to this configuration only)
+
+    :param configuration: the configuration
+    :return: the result, which contains the configuration and the measured values
+    """
+    policy = ActionPolicy(configuration["policy"], configuration["numEnvs"], configuration["seed"])
+    fastMotion = configuration["motion"] == "fast"
+    if configuration["numEnvs"] == 1:
+        measurements = benchmarkSingleEnv(configuration["level"], configuration["rendering"], fastMotion,
+            configuration["actionRepeat"], policy, configuration["numSteps"], configuration["numResets"])
+    else:
+        measurements = benchmarkParallelEnvs(configuration["level"], fastMotion, configuration["actionRepeat"],
+            configuration["numEnvs"], policy, configuration["numSteps"], configuration["numResets"])
+    result = dict(configuration)
+    result.update(levelInfo(configuration["level"]))
+    result.update(measurements)
+    result.update(peakRssMB())
+    return result
+
+
+def createConfigurations(args) -> List[Dict[str, Any]]:
+    configurations = []
+    for level in args.levels:
+        for rendering in args.rendering:
+            for motion in args.motion:
+                for actionRepeat in args.actionRepeat:
+                    for numEnvs in args.numEnvs:
+                        if rendering and numEnvs > 1:
+                            continue  # parallel environments are headless
+                        for policy in args.policies:
+                            configurations.append(dict(level=level, rendering=rendering, motion=motion,
+                                actionRepeat=actionRepeat, numEnvs=numEnvs, policy=policy, numSteps=args.steps,
+                                numResets=args.resets, seed=args.seed))
+    return configurations
+
+
+def metadata() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"timestamp": datetime.datetime.now().isoformat(), "gitCommit": commit, "python": platform.python_version(),
+        "numpy": np.__version__, "pygame": pygame.version.ver, "platform": platform.platform(),
+        "cpuCount": os.cpu_count()}
+
+
+def saveResults(results: List[Dict[str, Any]], outputDir: str, name: str):
+    os.makedirs(outputDir, exist_ok=True)
+    basePath = os.path.join(outputDir, name)
+    with open(basePath + ".json", "w") as f:
+        json.dump({"metadata": metadata(), "results": results}, f, indent=2)
+    with open(basePath + ".csv", "w", newline="") as f:
+        fieldnames = []
+        for r in results:
+            fieldnames.extend(k for k in r if k not in fieldnames)
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(results)
+    print(f"Results saved to {basePath}.json and {basePath}.csv")
+
+
+def defaultLevels() -> List[str]:
+    return sorted(f for f in os.listdir(config.levelsPath) if f.endswith(".grid"))
+
+
+def syntheticLevels(tileCounts: List[int], seed: int) -> List[str]:
+    """
+    Generates synthetic levels (see GridLevelGenerator) in the subdirectory "synthetic" of the levels directory
+
+    :param tileCounts: the (approximate) numbers of tiles of the levels to generate
+    :param seed: the random seed
+    :return: the levels (filenames relative to the levels directory)
+    """
+    levels = []
+    for numTiles in tileCounts:
+        width, height = syntheticLevelShape(numTiles)
+        level = os.path.join("synthetic", f"synthetic_{width}x{height}_s{seed}.grid")
+        GridLevelGenerator(width, height).write(os.path.join(config.levelsPath, level), seed)
+        levels.append(level)
+    return levels
+
+
+def parseArgs():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--levels", nargs="+", default=None,
+        help="the grid levels (filenames relative to the levels directory); default: all grid levels")
+    parser.add_argument("--syntheticTiles", nargs="+", type=int, default=[],
+        help="the (approximate) numbers of tiles of synthetic levels to generate and add to the levels, e.g. 1000 100000")
+    parser.add_argument("--syntheticSeed", type=int, default=0, help="the seed with which synthetic levels are generated")
+    parser.add_argument("--rendering", nargs="+", choices=["off", "on"], default=["off", "on"])
+    parser.add_argument("--motion", nargs="+", choices=["default", "fast"], default=["default", "fast"],
+        help="the motion engines (MeatBoyMotion or FastMeatBoyMotion)")
+    parser.add_argument("--actionRepeat", nargs="+", type=int, default=[1],
+        help="the numbers of frames simulated per environment step")
+    parser.add_argument("--numEnvs", nargs="+", type=int, default=[1, 4],
+        help="the numbers of parallel environments (each greater than 1 using one headless worker process per environment)")
+    parser.add_argument("--policies", nargs="+", choices=[POLICY_RANDOM, POLICY_SCRIPTED],
+        default=[POLICY_RANDOM, POLICY_SCRIPTED])
+    parser.add_argument("--steps", type=int, default=5000, help="the number of (vectorised) steps per rollout")
+    parser.add_argument("--resets", type=int, default=50, help="the number of resets for measuring the reset latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark_results", help="the directory in which to save the results")
+    parser.add_argument("--name", default=None, help="the base name of the result files; default: env_benchmark_<timestamp>")
+    args = parser.parse_args()
+    if args.levels is None:
+        args.levels = defaultLevels()
+    args.levels += syntheticLevels(args.syntheticTiles, args.syntheticSeed)
+    args.rendering = [r == "on" for r in args.rendering]
+    if args.name is None:
+        args.name = "env_benchmark_" + datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    return args
+
+
+if __name__ == '__main__':
+    args = parseArgs()
+    configurations = createConfigurations(args)
+    results = []
+    # run each configuration in a fresh process in order to measure its peak memory usage in isolation
+    context = multiprocessing.get_context("spawn")
+    for i, configuration in enumerate(configurations, start=1):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:  # non-daemonic, may start workers
+            result = executor.submit(runConfiguration, configuration).result()
+        results.append(result)
+        print(f"[{i}/{len(configurations)}] level={result['level']}, rendering={result['rendering']}, "
+            f"motion={result['motion']}, actionRepeat={result['actionRepeat']}, numEnvs={result['numEnvs']}, policy={result['policy']}: "
+            f"{result['stepsPerSecond']:.0f} steps/s, reset {result['resetMeanMs']:.3f} ms, "
+            f"peak RSS {result['peakRssMB']} MB")
+    saveResults(results, args.output, args.name)
@@ -0,0 +1,125 @@
+"""
+Steps BatchSimulation and Game instances (playing the same levels with the same actions) side by side and checks
+that rewards, terminations and observations (as built by FeatureObservationBuilder) are identical, both for single
+instances and for a batch of instances playing different levels (including the resetting of finished episodes)
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from game import config
+from game.batch import BatchSimulation
+from game.game import Game
+from game.level_generator import GridLevelGenerator
+from game.observation import FeatureObservationBuilder
+from game.remote_control import RemoteAction
+
+ACTIONS = list(RemoteAction)
+GRID_CONTEXT = 5
+
+
+class GameInstance:
+    """
+    A Game which is stepped in the same way as an instance of BatchSimulation (and agent.Env with action repeat 1)
+    """
+    def __init__(self, level: str):
+        self.game = Game([level], enableRendering=False)
+        self.featureObservation = FeatureObservationBuilder(GRID_CONTEXT)
+        self.prevScore = self.game.score
+
+    def step(self, actionIdx: int):
+        game = self.game
+        game.avatar.applyAction(ACTIONS[actionIdx])
+        game.processDataStreams()
+        game.update()
+        reward = game.score - self.prevScore
+        self.prevScore = game.score
+        return reward, game.levelStatus.isOver(), self.featureObservation.build(game)
+
+    def reset(self):
+        self.game.resetLevel()
+        self.prevScore = self.game.score
+
+
+def matches(reward, done, obs, batchReward, batchDone, batchObs) -> bool:
+    return abs(reward - batchReward) < 1e-9 and done == batchDone and np.allclose(obs, batchObs, rtol=0, atol=1e-9)
+
+
+def compareSingleInstances(levels, numSequences: int, numSteps: int) -> int:
+    """
+    :return: the number of action sequences for which a mismatch occurred
+    """
+    numMismatches = 0
+    for level in levels:
+        numComparedSteps = 0
+        for seed in range(numSequences):
+            rand = np.random.RandomState(seed)
+            instance = GameInstance(level)
+            simulation = BatchSimulation([level], 1, gridContext=GRID_CONTEXT)
+            actionIdx = 0
+            for step in range(numSteps):
+                if step == 0 or rand.rand() < 0.3:  # actions are held for several frames
+                    actionIdx = rand.randint(len(ACTIONS))
+                reward, done, obs = instance.step(actionIdx)
+                batchRewards, batchDones = simulation.step(np.array([actionIdx]))
+                numComparedSteps += 1
+                if not matches(reward, done, obs, batchRewards[0], batchDones[0], simulation.getObservations()[0]):
+                    print(f"MISMATCH in {level} with seed {seed} at step {step}")
+                    numMismatches += 1
+                    break
+                if done:
+                    break
+        print(f"{os.path.basename(level)}: compared {numComparedSteps} steps of {numSequences} action sequences")
+    return numMismatches
+
+
+def compareBatch(levels, numInstances: int, numSteps: int, seed: int = 0) -> int:
+    """
+    :return: the number of mismatching instance steps
+    """
+    rand = np.random.RandomState(seed)
+    instances = [GameInstance(levels[i % len(levels)]) for i in range(numInstances)]
+    simulation = BatchSimulation(levels, numInstances, gridContext=GRID_CONTEXT)
+    numMismatches = 0
+    numEpisodes = 0
+    for step in range(numSteps):
+        actionIndices = rand.randint(len(ACTIONS), size=numInstances)
+        batchRewards, batchDones = simulation.step(actionIndices)
+        batchObs = simulation.getObservations()
+        for i, instance in enumerate(instances):
+            reward, done, obs = instance.step(actionIndices[i])
+            if not matches(reward, done, obs, batchRewards[i], batchDones[i], batchObs[i]):
+                print(f"MISMATCH for instance {i} ({levels[i % len(levels)]}) at step {step}")
+                numMismatches += 1
+            if done:
+                instance.reset()
+                numEpisodes += 1
+        if batchDones.any():
+            simulation.reset(batchDones)
+    print(f"Batch of {numInstances} instances: compared {numSteps} steps ({numEpisodes} episodes ended)")
+    return numMismatches
+
+
+if __name__ == '__main__':
+    levels = sys.argv[1:]
+    if len(levels) == 0:
+        levels = ["test.grid", "test2.grid", "test3.grid", "test4.grid", "holes.grid"]
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        # generated levels with several exits
+        generator = GridLevelGenerator(120, 20, numExits=3)
+        generatedLevels = []
+        for seed in range(3):
+            path = os.path.join(tmpDir, f"generated_{seed}.grid")
+            generator.write(path, seed)
+            generatedLevels.append(os.path.relpath(path, config.levelsPath))
+
+        numMismatches = compareSingleInstances(levels + generatedLevels, 8, 1500)
+        numMismatches += compareBatch(levels, 10, 3000)
+
+    if numMismatches > 0:
+        print(f"BatchSimulation differs from Game in {numMismatches} cases")
+        sys.exit(1)
+    print("BatchSimulation and Game are identical")
@@ -0,0 +1,69 @@
+"""
+Replays action sequences against both motion engines (MeatBoyMotion and FastMeatBoyMotion) and checks that the
+resulting trajectories are bit-identical
+"""
+import sys
+
+import numpy as np
+
+from game.game import Game
+from game.remote_control import RemoteAction, RemoteActionEventGenerator
+
+
+def createActionSequence(seed: int, numSteps: int) -> list:
+    """
+    Creates a random sequence of actions where each action is held for a random number of frames (as a human or
+    a trained agent would do)
+    """
+    rand = np.random.RandomState(seed)
+    actions = list(RemoteAction)
+    sequence = []
+    while len(sequence) < numSteps:
+        action = actions[rand.randint(len(actions))]
+        sequence.extend([action] * rand.randint(1, 30))
+    return sequence[:numSteps]
+
+
+def recordTrajectory(level: str, actionSequence: list, fastMotion: bool) -> list:
+    game = Game([level], enableRendering=False, fastMotion=fastMotion)
+    actionGen = RemoteActionEventGenerator()
+    trajectory = []
+    for action in actionSequence:
+        for e in actionGen.actionToEvents(action):
+            game.postEvent(e)
+        game.processDataStreams()
+        game.update()
+        motion = game.avatar.motion
+        trajectory.append((game.avatar.pos.tobytes(), motion.vel.tobytes(), motion.acc.tobytes(),
+            motion.accFriction.tobytes(), motion.velocityVector().tobytes(), motion.accelerationVector().tobytes(),
+            motion.onGround, motion.onLeftWall, motion.onRightWall, game.score, game.levelStatus))
+        if game.levelStatus.isOver():
+            game.resetLevel()
+            actionGen = RemoteActionEventGenerator()
+    return trajectory
+
+
+if __name__ == '__main__':
+    levels = sys.argv[1:]
+    if len(levels) == 0:
+        levels = ["test.grid", "test2.grid", "test3.grid", "test4.grid"]
+    numSequences = 20
+    numSteps = 2000
+
+    numMismatches = 0
+    for level in levels:
+        for seed in range(numSequences):
+            actionSequence = createActionSequence(seed, numSteps)
+            trajectory = recordTrajectory(level, actionSequence, False)
+            fastTrajectory = recordTrajectory(level, actionSequence, True)
+            for step, (s1, s2) in enumerate(zip(trajectory, fastTrajectory)):
+                if s1 != s2:
+                    print(f"MISMATCH in {level} with seed {seed} at step {step}:\n  {s1}\n  {s2}")
+                    numMismatches += 1
+                    break
+        print(f"{level}: compared {numSequences} action sequences of {numSteps} steps")
+
+    if numMismatches > 0:
+        print(f"Trajectories differ for {numMismatches} action sequences")
+        sys.exit(1)
+    print("Trajectories are identical")
@@ -0,0 +1,11 @@
+from agent import PPOAgent
+from game.debug import configureLogging
+from game.game import Game
+
+if __name__ == '__main__':
+    configureLogging()
+    game = Game(["test.grid"], enableRendering=False)
+
+    # exports the policy of the stored model to models/ppo-4750000.npz (see run_game_with_agent.py)
+    agent = PPOAgent(game, load=True, suffix="4750000")
+    agent.exportPolicy()
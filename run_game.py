@@ -1,8 +1,10 @@
 import sys
 
+from game.debug import configureLogging
 from game.game import Game
 
 if __name__ == '__main__':
+    configureLogging()
     argv = sys.argv[1:]
     if len(argv) == 0:
         levels = ["test.grid", "test2.grid", "test3.grid", "test4.grid"]
@@ -1,13 +1,24 @@
-import sys
+import os
 
-from agent import PPOAgent
+from game.debug import configureLogging
 from game.game import Game
+from policy_runtime import NumpyPolicy, NumpyPolicyRemoteController
 
 if __name__ == '__main__':
+    configureLogging()
     levels = ["test.grid", "test2.grid", "test3.grid", "test4.grid"]
     game = Game(levels)
 
-    agent = PPOAgent(game, load=True, suffix="4750000")
-    game.remoteController = agent.createRemoteController(deterministic=False)
+    # applies the exported policy (see run_export_policy.py) without loading torch or stable_baselines3
+    policyPath = os.path.join("models", "ppo-4750000.npz")
+    if not os.path.exists(policyPath):
+        modelPath = os.path.splitext(policyPath)[0] + ".zip"
+        if not os.path.exists(modelPath):
+            raise FileNotFoundError(f"Neither the exported policy {policyPath} nor the model {modelPath} exists")
+        # export the policy once (loading the model requires stable_baselines3); equivalent to run_export_policy.py
+        from agent import PPOAgent
+        PPOAgent(Game(["test.grid"], enableRendering=False), load=True, suffix="4750000").exportPolicy()
+    policy = NumpyPolicy.load(policyPath)
+    game.remoteController = NumpyPolicyRemoteController(game, policy, deterministic=False)
 
     game.mainLoop()
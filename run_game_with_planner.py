@@ -0,0 +1,21 @@
+import sys
+
+from game.debug import configureLogging
+from game.game import Game
+from planning import RolloutPlanningController
+
+if __name__ == '__main__':
+    configureLogging()
+    argv = sys.argv[1:]
+    if len(argv) == 0:
+        levels = ["test.grid", "test2.grid", "test3.grid", "test4.grid"]
+    else:
+        levels = [argv[0]]
+    game = Game(levels)
+
+    controller = RolloutPlanningController(game, numWorkers=4, timeBudget=0.05)
+    game.remoteController = controller
+    try:
+        game.mainLoop()
+    finally:
+        controller.close()
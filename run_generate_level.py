@@ -0,0 +1,33 @@
+"""
+Generates a synthetic grid-based level (see GridLevelGenerator)
+"""
+import argparse
+import os
+
+from game import config
+from game.level_generator import GridLevelGenerator, syntheticLevelShape
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=None)
+    parser.add_argument("--height", type=int, default=None)
+    parser.add_argument("--tiles", type=int, default=10000,
+        help="the approximate number of tiles (determining width and height unless both are given)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--density", type=float, default=0.75, help="the fraction of floor cells that are platforms")
+    parser.add_argument("--walls", type=float, default=0.04, help="the probability of a wall on a floor cell")
+    parser.add_argument("--exits", type=int, default=1, help="the number of exits")
+    parser.add_argument("--output", default=None,
+        help="the path of the grid file; default: generated_<width>x<height>_s<seed>.grid in the levels directory")
+    args = parser.parse_args()
+
+    width, height = syntheticLevelShape(args.tiles)
+    if args.width is not None and args.height is not None:
+        width, height = args.width, args.height
+    generator = GridLevelGenerator(width, height, platformDensity=args.density, wallProbability=args.walls,
+        numExits=args.exits)
+    path = args.output
+    if path is None:
+        path = os.path.join(config.levelsPath, f"generated_{width}x{height}_s{args.seed}.grid")
+    generator.write(path, args.seed)
+    print(f"Level of size {width}x{height} written to {path}")
@@ -1,12 +1,15 @@
+import os
+
 from agent import *
 from game import Game
+from game.debug import configureLogging
 
 
 log = logging.getLogger(__name__)
 
 
-def createGame():
-    return Game(["test.grid", "test2.grid", "test3.grid", "test4.grid"], enableRendering=True)
+def createGame(enableRendering=True):
+    return Game(["test.grid", "test2.grid", "test3.grid", "test4.grid"], enableRendering=enableRendering)
 
 
 class EnvWrapper(Env):
@@ -15,13 +18,21 @@ class EnvWrapper(Env):
 
 
 if __name__ == '__main__':
-    logging.basicConfig()
+    configureLogging()
 
     saveEveryNumTimeSteps = 250000
-    enableRendering = True  # disable to increase learning speed (almost double)
-
-    #agent = A2CAgent(createGame())
-    agent = PPOAgent(createGame(), load=False, suffix=4750000)
+    enableRendering = False  # enable to watch the training of a single environment
+    numWorkers = os.cpu_count()  # number of parallel headless environments (one process each) if rendering is disabled
+    actionRepeat = 1  # number of frames for which each action of the agent is applied
+
+    levels = ["test.grid", "test2.grid", "test3.grid", "test4.grid"]
+    if enableRendering:
+        agent = PPOAgent(createGame(enableRendering), load=False, suffix=4750000, actionRepeat=actionRepeat)
+    else:
+        agent = PPOAgent(HeadlessGameFactory(levels), load=False, suffix=4750000, numWorkers=numWorkers,
+            actionRepeat=actionRepeat)
+    #agent = A2CAgent(createGame(enableRendering))
+    #agent = PPOAgent(BatchEnv(levels, 16))
     #agent = SACAgent(EnvWrapper, load=True, pathElems=["checkpoint_000501", "checkpoint-501"])
 
     while True:
@@ -1,21 +1,30 @@
+import functools
 import logging
 import os
+import threading
 from abc import ABC, abstractmethod
 from pprint import pprint
-from typing import Optional
+from time import perf_counter
+from typing import Optional, Sequence, Union, List, Any, Callable
 
 import gym
 import numpy as np
-from ray.rllib.algorithms import sac, ppo
+import torch
 from stable_baselines3 import A2C, DQN, PPO
 from stable_baselines3.common.base_class import BaseAlgorithm
-import pygame
+from stable_baselines3.common.policies import ActorCriticPolicy
+from stable_baselines3.common.preprocessing import is_image_space
+from stable_baselines3.common.torch_layers import FlattenExtractor
+from stable_baselines3.common.vec_env import VecEnv, SubprocVecEnv, DummyVecEnv, VecMonitor
 
 from game import Game
-from game.debug import log
-from game.level import GridLevel
-from game.objects import ControlledAvatar
-from game.remote_control import RemoteAction, RemoteActionEventGenerator, RemoteController
+from game.batch import BatchSimulation
+from game.debug import getLogger
+from game.observation import FeatureObservationBuilder, PixelObservationRenderer
+from game.remote_control import RemoteAction, RemoteController
+from policy_runtime import NumpyPolicy
+
+log = getLogger(__name__)
 
 AGENT_STORAGE_PATH = os.path.join("models")
 
@@ -25,82 +34,362 @@ class Env(gym.Env):
 
     GRID_CONTEXT = 5
 
-    def __init__(self, game):
+    def __init__(self, game, actionRepeat: int = 1, pixelObservation: Optional[PixelObservationRenderer] = None):
+        """
+        :param game: the game
+        :param actionRepeat: the number of frames for which each action is applied (frame skip), i.e. the number of
+            frames simulated in each step; the step's reward is the sum of the frames' rewards and the observation is
+            built only for the last frame. The step ends early if the level ends.
+        :param pixelObservation: if not None, use the (stacked) images rendered by the given renderer as observations
+            instead of the feature vector
+        """
+        if actionRepeat < 1:
+            raise ValueError("actionRepeat must be at least 1")
         self.rand = np.random.RandomState()
         self.game = game
-        gridContextSize = (2 * self.GRID_CONTEXT + 1) * (2 * self.GRID_CONTEXT + 1)
-        obsSize = 2 * gridContextSize
-        obsSize += 2  # exit direction
-        obsSize += 2  # avatar position offset in cell
-        obsSize += 2 * 2  # avatar acceleration and velocity vectors
-        obsSize += 3  # avatar motion flags
-        self.observation_space = gym.spaces.Box(-1.0, 1.0, shape=[obsSize])
+        self.actionRepeat = actionRepeat
+        self.pixelObservation = pixelObservation
+        self.featureObservation = FeatureObservationBuilder(self.GRID_CONTEXT)
+        self.observation_space = gym.spaces.Box(-1.0, 1.0, shape=[self.featureObservation.size])
         self.actions = list(RemoteAction)
         self.action_space = gym.spaces.Discrete(len(self.actions))
         self.prevScore = self.game.score
-        self.actionGen: Optional[RemoteActionEventGenerator] = None
+        if pixelObservation is not None:
+            self.observation_space = gym.spaces.Box(0, 255, shape=pixelObservation.shape, dtype=np.uint8)
 
     def reset(self):
-        self.game.resetLevel()
-        self.actionGen = RemoteActionEventGenerator()
-        return self.get_obs()
-
-    def get_obs(self):
-        av: ControlledAvatar = self.game.avatar
-        if not isinstance(self.game.level, GridLevel):
-            raise ValueError(f"Only levels of type {GridLevel} are supported")
-        level: GridLevel = self.game.level
-        exit = level.exits.sprites()[0]
-        grid = level.grid
-        avatarCell = grid.gridCellForPos(av.pos)
-        exitVector = exit.pos - av.pos
-        exitVectorNorm = np.linalg.norm(exitVector)
-        exitDirection = np.zeros(2) if exitVectorNorm == 0 else exitVector / exitVectorNorm
-        positionOffsetInCell = grid.offsetInCell(av.pos)
-        motionScale = 26
-        acc = av.motion.accelerationVector() / motionScale
-        vel = av.motion.velocityVector() / motionScale
-        motionFlags = np.array([av.motion.onLeftWall, av.motion.onRightWall, av.motion.onGround]).astype(float)
-        surroundingGrid = grid.surroundingGrid(avatarCell, self.GRID_CONTEXT, self.GRID_CONTEXT, self.GRID_CONTEXT, self.GRID_CONTEXT)
-        gridPlatform: np.ndarray = (surroundingGrid == "X").astype(float)
-        gridExit: np.ndarray = (surroundingGrid == "E").astype(float)
-        obs = np.concatenate([gridPlatform.flatten(), gridExit.flatten(), exitDirection, positionOffsetInCell, vel, acc, motionFlags])
-        return obs
+        if self.game.levelStatus.isOver():
+            self.game.checkLevelChange()  # after an exit, continues with the next level in the game's rotation
+        else:
+            self.game.resetLevel()
+        if self.pixelObservation is not None:
+            return self.pixelObservation.reset(self.game).copy()
+        return self.get_obs().copy()
+
+    def get_obs(self) -> np.ndarray:
+        """
+        Computes the observation for the current state of the game (adding a frame to the frame stack in case of
+        pixel observations)
+
+        :return: the observation; note that the array is reused (overwritten) by subsequent calls
+        """
+        if self.pixelObservation is not None:
+            return self.pixelObservation.render(self.game)
+        return self.featureObservation.build(self.game)
 
     def step(self, actionIdx: int):
-        # apply action
-        action = self.actions[actionIdx]
-        events = self.actionGen.actionToEvents(action)
-        for e in events:
-            pygame.event.post(e)
+        # apply action (which remains in effect for all frames of the step)
+        self.game.avatar.applyAction(self.actions[actionIdx])
 
         # advance game
-        self.game.processDataStreams()
-        self.game.update()
-        self.game.draw()
-
-        reward = self.game.score - self.prevScore
+        for _ in range(self.actionRepeat):
+            self.game.processDataStreams()
+            self.game.update()
+            self.game.draw()
+            self.game.endFrame()
+            if self.game.levelStatus.isOver():
+                break
+
+        reward = self.game.score - self.prevScore  # the sum of the rewards of all frames
         self.prevScore = self.game.score
         done = self.game.levelStatus.isOver()
         if done:
-            log(f"Episode ended after {self.game.time} with score={self.game.score}")
+            log("Episode ended after", self.game.time, "with score", self.game.score)
         info = {}
-        return self.get_obs(), reward, done, info
+        return self.get_obs().copy(), reward, done, info
 
     def render(self, mode="ansi"):
         pass
 
 
+class BatchEnv(VecEnv):
+    """
+    A vectorised environment which steps N instances of grid-based levels in lockstep (via BatchSimulation) and is
+    equivalent to N instances of Env (for headless games playing the same levels)
+    """
+    def __init__(self, levels: Sequence[str], numEnvs: int):
+        """
+        :param levels: the grid levels (filenames relative to the levels directory), which are assigned to the
+            environments in rotation
+        :param numEnvs: the number of environments
+        """
+        self.simulation = BatchSimulation(levels, numEnvs, gridContext=Env.GRID_CONTEXT)
+        self.actions = list(RemoteAction)
+        observationSpace = gym.spaces.Box(-1.0, 1.0, shape=[self.simulation.observationSize])
+        super().__init__(numEnvs, observationSpace, gym.spaces.Discrete(len(self.actions)))
+        self._actions = None
+
+    def reset(self):
+        self.simulation.reset()
+        return self.simulation.getObservations().astype(self.observation_space.dtype)
+
+    def step_async(self, actions: np.ndarray):
+        self._actions = actions
+
+    def step_wait(self):
+        rewards, dones = self.simulation.step(self._actions)
+        obs = self.simulation.getObservations()
+        infos = [{} for _ in range(self.num_envs)]
+        if dones.any():
+            for i in np.flatnonzero(dones):
+                log("Episode ended after", self.simulation.time[i], "with score", self.simulation.score[i])
+                infos[i]["terminal_observation"] = obs[i].copy()
+            self.simulation.reset(dones)
+            obs = self.simulation.getObservations()
+        return obs.astype(self.observation_space.dtype), rewards.astype(np.float32), dones.copy(), infos
+
+    def close(self):
+        pass
+
+    def _indices(self, indices) -> List[int]:
+        if indices is None:
+            return list(range(self.num_envs))
+        elif isinstance(indices, int):
+            return [indices]
+        return list(indices)
+
+    def _checkAllIndices(self, indices: List[int], operation: str):
+        if sorted(set(indices)) != list(range(self.num_envs)):
+            raise NotImplementedError(f"{operation} is not supported for individual environments of a BatchEnv, "
+                "as the environments share the batch's attributes and methods")
+
+    def get_attr(self, attr_name: str, indices=None) -> List[Any]:
+        # attributes are shared by all environments
+        return [getattr(self, attr_name) for _ in self._indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices=None) -> None:
+        self._checkAllIndices(self._indices(indices), f"Setting attribute '{attr_name}'")
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> List[Any]:
+        """
+        Calls a method for the given environments, where resetting is supported for individual environments and
+        other methods are called once for the entire batch (requiring all environments to be selected)
+        """
+        indices = self._indices(indices)
+        if method_name == "reset":
+            mask = np.zeros(self.num_envs, dtype=bool)
+            mask[indices] = True
+            self.simulation.reset(mask)
+            obs = self.simulation.getObservations().astype(self.observation_space.dtype)
+            return [obs[i] for i in indices]
+        self._checkAllIndices(indices, f"Calling method '{method_name}'")
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result for _ in indices]
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        return [False for _ in self._indices(indices)]
+
+    def seed(self, seed: Optional[int] = None):
+        return [None for _ in range(self.num_envs)]
+
+
+class HeadlessGameFactory:
+    """
+    Creates headless games for parallel environment workers, where each worker plays all levels in rotation,
+    starting at a distinct level (such that the workers' starting levels are spread across the levels)
+    """
+    def __init__(self, levels: Sequence[str], fastMotion=True):
+        """
+        :param levels: the levels (filenames relative to the levels directory)
+        :param fastMotion: whether to use the fast motion engine (see Game)
+        """
+        self.levels = list(levels)
+        self.fastMotion = fastMotion
+
+    def __call__(self, workerIndex: int) -> Game:
+        offset = workerIndex % len(self.levels)
+        levels = self.levels[offset:] + self.levels[:offset]
+        return Game(levels, enableRendering=False, fastMotion=self.fastMotion)
+
+
+def _createWorkerEnv(gameFactory: Callable[[int], Game], workerIndex: int, actionRepeat: int = 1) -> Env:
+    return Env(gameFactory(workerIndex), actionRepeat=actionRepeat)
+
+
 class AgentRemoteController(RemoteController):
-    def __init__(self, agent: "DeepRLAgent", deterministic=True):
-        super().__init__()
+    def __init__(self, agent: "Agent", env: Env, deterministic=True):
+        """
+        :param agent: the agent whose model chooses the actions
+        :param env: the environment of the controlled game, which is used to build the observations (and which
+            need not be the environment the agent was trained with)
+        :param deterministic: whether to choose actions deterministically
+        """
         self.agent = agent
+        self.env = env
         self.deterministic = deterministic
+        self.actions = list(RemoteAction)
+        super().__init__()
+
+    def reset(self):
+        super().reset()
+        self._action: Optional[RemoteAction] = None
+        self._numRemainingFrames = 0
 
     def _chooseAction(self) -> RemoteAction:
-        obs = self.agent.env.get_obs()
-        actionIdx, _ = self.agent.model.predict(obs, deterministic=self.deterministic)
-        return self.agent.env.actions[actionIdx]
+        # like in training, each action is held for the agent's number of action repeat frames
+        if self._numRemainingFrames == 0:
+            obs = self.env.get_obs()
+            actionIdx, _ = self.agent.model.predict(obs, deterministic=self.deterministic)
+            self._action = self.actions[actionIdx]
+            self._numRemainingFrames = self.env.actionRepeat
+        self._numRemainingFrames -= 1
+        return self._action
+
+
+class InferenceRequest:
+    """
+    A (reusable) request for an action, which is completed by a PolicyInferenceService
+    """
+    __slots__ = ("actionIdx", "done")
+
+    def __init__(self):
+        self.actionIdx: Optional[int] = None
+        self.done = True
+
+
+class PolicyInferenceService:
+    """
+    Collects the observations of many controllers (of games running at the same time) and computes their actions
+    with one batched call to the policy's predict method. A batch is processed as soon as it is full, when flush is
+    called (e.g. once per tick, see runGamesBatched) or, for controllers waiting in different threads, when the
+    deadline of the oldest pending request has passed.
+    """
+    def __init__(self, model: BaseAlgorithm, observationSpace: gym.spaces.Box, maxBatchSize: int = 64,
+            maxLatency: float = 0.002, deterministic=True):
+        """
+        :param model: the model whose policy to apply
+        :param observationSpace: the observation space
+        :param maxBatchSize: the maximum number of observations to process in one call to predict
+        :param maxLatency: the maximum time (in seconds) for which a request waits for further requests to be
+            batched with it
+        :param deterministic: whether to choose actions deterministically
+        """
+        self.model = model
+        self.maxBatchSize = maxBatchSize
+        self.maxLatency = maxLatency
+        self.deterministic = deterministic
+        self.numBatches = 0
+        self.numRequests = 0
+        self._obs = np.zeros((maxBatchSize,) + tuple(observationSpace.shape), dtype=observationSpace.dtype)
+        self._pending: List[InferenceRequest] = []
+        self._firstPendingTime = 0.0
+        self._condition = threading.Condition()
+
+    def submit(self, request: InferenceRequest, obs: np.ndarray):
+        """
+        Submits a request for the action for the given observation
+
+        :param request: the request object, which is completed asynchronously
+        :param obs: the observation (which is copied)
+        """
+        with self._condition:
+            if len(self._pending) == 0:
+                self._firstPendingTime = perf_counter()
+            self._obs[len(self._pending)] = obs
+            request.done = False
+            self._pending.append(request)
+            if len(self._pending) == self.maxBatchSize:
+                self._processBatch()
+
+    def _processBatch(self):
+        n = len(self._pending)
+        if n == 0:
+            return
+        actions, _ = self.model.predict(self._obs[:n], deterministic=self.deterministic)
+        for request, actionIdx in zip(self._pending, actions):
+            request.actionIdx = int(actionIdx)
+            request.done = True
+        self._pending.clear()
+        self.numBatches += 1
+        self.numRequests += n
+        self._condition.notify_all()
+
+    def flush(self):
+        """
+        Processes all pending requests
+        """
+        with self._condition:
+            self._processBatch()
+
+    def wait(self, request: InferenceRequest) -> int:
+        """
+        Waits for the given request to be completed, processing the pending requests once the deadline of the
+        oldest one has passed
+
+        :param request: a submitted request
+        :return: the index of the action
+        """
+        with self._condition:
+            while not request.done:
+                remainingTime = self._firstPendingTime + self.maxLatency - perf_counter()
+                if remainingTime <= 0:
+                    self._processBatch()
+                else:
+                    self._condition.wait(remainingTime)
+            return request.actionIdx
+
+
+class BatchedAgentRemoteController(RemoteController):
+    """
+    A controller which obtains its actions from a PolicyInferenceService (shared with other controllers)
+    """
+    def __init__(self, env: Env, service: PolicyInferenceService):
+        """
+        :param env: the environment of the controlled game (which is used to build observations and determines
+            the number of frames for which each action is held)
+        :param service: the inference service
+        """
+        self.env = env
+        self.service = service
+        self._request = InferenceRequest()
+        super().__init__()
+
+    def reset(self):
+        super().reset()
+        self._action: Optional[RemoteAction] = None
+        self._numRemainingFrames = 0
+        self._submitted = False
+
+    def prepare(self):
+        """
+        Submits the request for the next action if a new action is to be chosen in the current frame, such that
+        the requests of all controllers can be processed in a single batch before the games are updated
+        """
+        if self._numRemainingFrames == 0 and not self._submitted:
+            self.service.submit(self._request, self.env.get_obs())
+            self._submitted = True
+
+    def _chooseAction(self) -> RemoteAction:
+        if self._numRemainingFrames == 0:
+            self.prepare()
+            self._action = self.env.actions[self.service.wait(self._request)]
+            self._submitted = False
+            self._numRemainingFrames = self.env.actionRepeat
+        self._numRemainingFrames -= 1
+        return self._action
+
+
+def runGamesBatched(games: Sequence[Game], service: PolicyInferenceService, numFrames: int):
+    """
+    Runs several games (whose remote controllers are BatchedAgentRemoteControllers using the given service) in
+    lockstep and without limiting the frame rate, processing the action requests of all games in one batch per frame
+
+    :param games: the games
+    :param service: the inference service
+    :param numFrames: the number of frames to run
+    """
+    for _ in range(numFrames):
+        for game in games:
+            game.checkLevelChange()
+        for game in games:
+            game.remoteController.prepare()
+        service.flush()
+        for game in games:
+            game.processDataStreams()
+            game.update()
+            game.draw()
+            game.endFrame()
 
 
 class Agent(ABC):
@@ -122,20 +411,44 @@ class Agent(ABC):
             filebasename += f"-{suffix}"
         return os.path.join(AGENT_STORAGE_PATH, f"{filebasename}.zip")
 
+    def createRemoteController(self, game: Optional[Game] = None, deterministic=True) -> AgentRemoteController:
+        """
+        :param game: the game to control; if None, control the game of the environment the agent was created with,
+            which requires that environment to be a single (non-vectorised) Env
+        :param deterministic: whether to choose actions deterministically
+        :return: the controller
+        """
+        actionRepeat = getattr(self, "actionRepeat", 1)
+        if game is not None:
+            env = Env(game, actionRepeat=actionRepeat)
+        else:
+            env = getattr(self, "env", None)
+            if not isinstance(env, Env):
+                raise ValueError("The agent was not created with a single game; pass the game to control")
+        return AgentRemoteController(self, env, deterministic=deterministic)
+
 
 class DeepRLAgent(Agent, ABC):
-    def __init__(self, game: Game, load: bool, filebasename: str, suffix=None):
+    def __init__(self, game: Union[Game, VecEnv, Callable[[int], Game]], load: bool, filebasename: str, suffix=None,
+            numWorkers: int = 1, actionRepeat: int = 1):
         """
+        :param game: the game to play (which is wrapped in an Env), a vectorised environment (such as BatchEnv) or a
+            factory which creates the game for the worker with the given index (such as HeadlessGameFactory)
         :param load: whether to load a previously stored model
         :param filebasename: the base filename for storage
         :param suffix: filename suffix
+        :param numWorkers: the number of environment workers to create if a game factory is given; for more than one
+            worker, each environment runs in a separate process
+        :param actionRepeat: the number of frames for which each action is applied (see Env); not supported for
+            vectorised environments that are passed directly
         """
         super().__init__(filebasename, suffix=suffix)
-        self.env = Env(game)
+        self.actionRepeat = actionRepeat
+        self.env = self._createEnv(game, numWorkers, actionRepeat)
         self.model = self._createModel(self.env)
         if load:
             path = self._path(suffix)
-            log(f"Loading model from {path}")
+            log("Loading model from", path)
             env = self.model.env
             self.model = self.model.load(path)
             self.model.env = env
@@ -144,12 +457,26 @@ class DeepRLAgent(Agent, ABC):
         else:
             self.model.totalTimeSteps = 0
 
+    @staticmethod
+    def _createEnv(game: Union[Game, VecEnv, Callable[[int], Game]], numWorkers: int, actionRepeat: int) \
+            -> Union[Env, VecEnv]:
+        if isinstance(game, Game):
+            return Env(game, actionRepeat=actionRepeat)
+        elif isinstance(game, VecEnv):
+            if actionRepeat != 1:
+                raise ValueError("Action repeat is not supported for vectorised environments that are passed directly")
+            return game
+        else:
+            envFns = [functools.partial(_createWorkerEnv, game, i, actionRepeat) for i in range(numWorkers)]
+            vecEnv = SubprocVecEnv(envFns) if numWorkers > 1 else DummyVecEnv(envFns)
+            return VecMonitor(vecEnv)
+
     @property
     def totalTimeSteps(self):
         return getattr(self.model, "totalTimeSteps")
 
     @abstractmethod
-    def _createModel(self, env: Env) -> BaseAlgorithm:
+    def _createModel(self, env: Union[Env, VecEnv]) -> BaseAlgorithm:
         pass
 
     def train(self, steps):
@@ -158,32 +485,81 @@ class DeepRLAgent(Agent, ABC):
 
     def save(self, suffix=None):
         path = self._path(suffix)
-        log(f"Saving agent to {path}")
+        log("Saving agent to", path)
         self.model.save(path)
 
-    def createRemoteController(self, deterministic=True) -> AgentRemoteController:
-        return AgentRemoteController(self, deterministic=deterministic)
+    def exportPolicy(self, suffix=None) -> str:
+        """
+        Exports the weights of the model's policy network to an array file next to the model file, such that the
+        policy can be applied with the NumPy-only runtime (see NumpyPolicy) without loading the model
+
+        :param suffix: filename suffix
+        :return: the path of the exported file
+        """
+        policy = self.model.policy
+        if not isinstance(policy, ActorCriticPolicy) or not isinstance(policy.features_extractor, FlattenExtractor) \
+                or not isinstance(self.env.action_space, gym.spaces.Discrete):
+            raise ValueError("Only MLP actor-critic policies with discrete actions can be exported")
+        linearLayers = []
+        activations = []
+        for module in list(policy.mlp_extractor.shared_net) + list(policy.mlp_extractor.policy_net) + \
+                [policy.action_net]:
+            if isinstance(module, torch.nn.Linear):
+                linearLayers.append(module)
+                activations.append("identity")
+            elif isinstance(module, (torch.nn.Tanh, torch.nn.ReLU)) and len(linearLayers) > 0:
+                activations[-1] = "tanh" if isinstance(module, torch.nn.Tanh) else "relu"
+            else:
+                raise ValueError(f"Unsupported policy network module {module}")
+        observationSpace = self.env.observation_space
+        normalize = policy.normalize_images and is_image_space(observationSpace)
+        gridContext = Env.GRID_CONTEXT if observationSpace.dtype != np.uint8 else None
+        numpyPolicy = NumpyPolicy([l.weight.detach().cpu().numpy() for l in linearLayers],
+            [l.bias.detach().cpu().numpy() for l in linearLayers], activations, observationSpace.shape,
+            observationScale=1.0 / 255 if normalize else 1.0, gridContext=gridContext, actionRepeat=self.actionRepeat)
+        path = os.path.splitext(self._path(suffix))[0] + ".npz"
+        log("Exporting policy to", path)
+        numpyPolicy.save(path)
+        return path
+
+    def createInferenceService(self, maxBatchSize: int = 64, maxLatency: float = 0.002, deterministic=True) \
+            -> PolicyInferenceService:
+        """
+        Creates a service for batched inference with this agent's policy, which can be shared by many controllers
+        (see createBatchedRemoteController)
+        """
+        return PolicyInferenceService(self.model, self.env.observation_space, maxBatchSize=maxBatchSize,
+            maxLatency=maxLatency, deterministic=deterministic)
+
+    def createBatchedRemoteController(self, game: Game, service: PolicyInferenceService) \
+            -> BatchedAgentRemoteController:
+        """
+        :param game: the game to control
+        :param service: the inference service (see createInferenceService)
+        :return: a controller for the given game, which obtains its actions from the service
+        """
+        return BatchedAgentRemoteController(Env(game, actionRepeat=self.actionRepeat), service)
 
 
 class A2CAgent(DeepRLAgent):
-    def __init__(self, game, load=False, suffix=None):
-        super().__init__(game, load, "a2c", suffix=suffix)
+    def __init__(self, game, load=False, suffix=None, numWorkers=1, actionRepeat=1):
+        super().__init__(game, load, "a2c", suffix=suffix, numWorkers=numWorkers, actionRepeat=actionRepeat)
 
     def _createModel(self, env) -> BaseAlgorithm:
         return A2C('MlpPolicy', env, verbose=1)
 
 
 class DQNAgent(DeepRLAgent):
-    def __init__(self, game, load=False):
-        super().__init__(game, load, "dqn")
+    def __init__(self, game, load=False, numWorkers=1, actionRepeat=1):
+        super().__init__(game, load, "dqn", numWorkers=numWorkers, actionRepeat=actionRepeat)
 
     def _createModel(self, env) -> BaseAlgorithm:
         return DQN('MlpPolicy', env, verbose=1)
 
 
 class PPOAgent(DeepRLAgent):
-    def __init__(self, game, load=False, suffix=None):
-        super().__init__(game, load, "ppo", suffix=suffix)
+    def __init__(self, game, load=False, suffix=None, numWorkers=1, actionRepeat=1):
+        super().__init__(game, load, "ppo", suffix=suffix, numWorkers=numWorkers, actionRepeat=actionRepeat)
 
     def _createModel(self, env) -> BaseAlgorithm:
         return PPO('MlpPolicy', env, verbose=1)
@@ -203,7 +579,7 @@ class SACAgent(Agent):
             if pathElems is None:
                 pathElems = []
             path = self._path(*pathElems, suffix=suffix)
-            log(f"Loading checkpoint from {path}")
+            log("Loading checkpoint from", path)
             self.model.load_checkpoint(path)
 
     @property
@@ -211,6 +587,8 @@ class SACAgent(Agent):
         return getattr(self.model, "totalTimeSteps")
 
     def _createModel(self, envCls):
+        from ray.rllib.algorithms import sac, ppo  # imported lazily, as importing ray is slow
+
         #config = ppo.DEFAULT_CONFIG.copy()
         config = sac.DEFAULT_CONFIG.copy()
         config["framework"] = "torch"
@@ -235,8 +613,5 @@ class SACAgent(Agent):
 
     def save(self, suffix=None):
         path = self._path(suffix=suffix)
-        log(f"Saving agent to {path}")
+        log("Saving agent to", path)
         self.model.save(path)
-
-    def createRemoteController(self, deterministic=True) -> AgentRemoteController:
-        return AgentRemoteController(self, deterministic=deterministic)
\ No newline at end of file
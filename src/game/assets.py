@@ -0,0 +1,132 @@
+import os
+from typing import Dict, Tuple, Optional, Iterable, Hashable
+
+import pygame
+
+from .debug import getLogger
+
+log = getLogger(__name__)
+
+GAME_IMAGES = (
+    (os.path.join("assets", "images", "background2.png"), False),
+    (os.path.join("assets", "images", "exit.png"), True),
+    (os.path.join("assets", "images", "portalActive.png"), True),
+    (os.path.join("assets", "images", "portalInactive.png"), True),
+    (os.path.join("assets", "anim", "left1.png"), True),
+    (os.path.join("assets", "anim", "left2.png"), True),
+    (os.path.join("assets", "anim", "left3.png"), True),
+    (os.path.join("assets", "anim", "leftwall.png"), True),
+    (os.path.join("assets", "anim", "idle.png"), True),
+)
+"""
+the image files used by the game along with the flag indicating whether they are converted to surfaces with
+per-pixel alpha (see preload)
+"""
+
+
+class AssetCache:
+    """
+    A cache of image surfaces, which loads each image file only once and derives scaled and flipped variants from
+    the loaded image (caching them, too), such that all game objects and renderers share the same surfaces.
+    Since surfaces are converted to the display's pixel format, images can only be loaded once a display exists.
+    Surfaces obtained from the cache are shared and must therefore not be modified.
+    """
+    def __init__(self):
+        self._images: Dict[Hashable, pygame.Surface] = {}
+        self.numFileLoads = 0
+        self.numHits = 0
+        self.numMisses = 0
+
+    def image(self, path: str, size: Optional[Tuple[int, int]] = None, alpha=True, flipX=False, flipY=False) \
+            -> pygame.Surface:
+        """
+        :param path: the image file path
+        :param size: the size to which to scale the image; if None, do not scale
+        :param alpha: whether to convert the image to a surface with per-pixel alpha (otherwise convert to the
+            display's pixel format without alpha)
+        :param flipX: whether to flip the image horizontally
+        :param flipY: whether to flip the image vertically
+        :return: the (shared) image surface
+        """
+        key = (path, None if size is None else tuple(size), alpha, flipX, flipY)
+        image = self._images.get(key)
+        if image is not None:
+            self.numHits += 1
+            return image
+        self.numMisses += 1
+        if flipX or flipY:
+            image = pygame.transform.flip(self.image(path, size=size, alpha=alpha), flipX, flipY)
+        elif size is not None:
+            image = pygame.transform.scale(self.image(path, alpha=alpha), size)
+        else:
+            image = pygame.image.load(path)
+            image = image.convert_alpha() if alpha else image.convert()
+            self.numFileLoads += 1
+        self._images[key] = image
+        return image
+
+    def solidImage(self, size: Tuple[int, int], color=(0, 0, 0), alpha=True, surfaceAlpha: Optional[int] = None) \
+            -> pygame.Surface:
+        """
+        :param size: the size of the surface
+        :param color: the colour with which to fill the surface
+        :param alpha: whether to convert the surface to a surface with per-pixel alpha (otherwise convert to the
+            display's pixel format without alpha)
+        :param surfaceAlpha: the surface alpha value to apply prior to the conversion; if None, do not apply any
+        :return: the (shared) surface of the given size that is filled with the given colour
+        """
+        key = ("solid", tuple(size), tuple(color), alpha, surfaceAlpha)
+        image = self._images.get(key)
+        if image is not None:
+            self.numHits += 1
+            return image
+        self.numMisses += 1
+        image = pygame.Surface(size)
+        image.fill(color)
+        if surfaceAlpha is not None:
+            image.set_alpha(surfaceAlpha)
+        image = image.convert_alpha() if alpha else image.convert()
+        self._images[key] = image
+        return image
+
+    def preload(self, images: Iterable[Tuple[str, bool]] = GAME_IMAGES):
+        """
+        Loads the given image files (unless they are already cached), such that no file needs to be read
+        while playing
+
+        :param images: pairs (path, alpha) of image file paths and flags indicating whether to convert the images
+            to surfaces with per-pixel alpha
+        """
+        for path, alpha in images:
+            self.image(path, alpha=alpha)
+        log("Preloaded images;", self.numImages(), "images cached,", self.memoryUsage() // 1024, "KB")
+
+    def numImages(self) -> int:
+        return len(self._images)
+
+    def memoryUsage(self) -> int:
+        """
+        :return: the (approximate) number of bytes occupied by the pixel data of the cached surfaces
+        """
+        return sum(s.get_bytesize() * s.get_width() * s.get_height() for s in self._images.values())
+
+    def stats(self) -> dict:
+        """
+        :return: a dictionary with the number of cached images, their memory usage (in bytes), the number of files
+            loaded and the numbers of cache hits and misses
+        """
+        return dict(numImages=self.numImages(), memoryUsage=self.memoryUsage(), numFileLoads=self.numFileLoads,
+            numHits=self.numHits, numMisses=self.numMisses)
+
+    def clear(self):
+        self._images.clear()
+
+
+_assetCache = AssetCache()
+
+
+def getAssetCache() -> AssetCache:
+    """
+    :return: the process-wide asset cache
+    """
+    return _assetCache
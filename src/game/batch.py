@@ -0,0 +1,406 @@
+import os
+from typing import List, Sequence, Tuple
+
+import numpy as np
+import pygame
+
+from . import config
+from .camera import ChasingCamera
+from .game import Game
+from .level import Grid
+from .objects import Avatar, ControlledAvatar
+from .objects.avatar.motion import MeatBoyMotion
+from .observation import FeatureObservationBuilder
+
+
+def _determineRectCoordinateConversion():
+    """
+    Determines how pygame converts non-integer coordinates assigned to Rect attributes (which depends on the pygame
+    version: older versions truncate, newer versions round half away from zero)
+
+    :return: a function applying the conversion to an array
+    """
+    r = pygame.Rect(0, 0, 0, 0)
+    r.x = 0.5
+    if r.x == 0:
+        return np.trunc
+    else:
+        return lambda x: np.copysign(np.floor(np.abs(x) + 0.5), x)
+
+
+_rectCoordinate = _determineRectCoordinateConversion()
+
+
+class BatchSimulation:
+    """
+    Simulates N independent instances of grid-based levels in lockstep, holding the game state of all instances in
+    arrays of shape (N, ...) and processing the physics (including collisions) of all instances at once.
+
+    An instance corresponds to a Game (with enableRendering=False) playing a single level, which is controlled via
+    RemoteActions in the same way as agent.Env; the simulation reproduces Game's scoring, MeatBoyMotion's physics and
+    Env's observations.
+    """
+    STATUS_RUNNING = 0
+    STATUS_OVER_DEATH = 1
+    STATUS_OVER_EXIT = 2
+
+    def __init__(self, levels: Sequence[str], numInstances: int, gridContext: int = 5):
+        """
+        :param levels: the grid levels (filenames relative to the levels directory); instance i plays level
+            levels[i % len(levels)]
+        :param numInstances: the number of instances N
+        :param gridContext: the number of grid cells in each direction around the avatar's cell that are part of
+            observations
+        """
+        from .remote_control import RemoteAction
+
+        self.numInstances = n = numInstances
+        self.gridContext = gridContext
+        self._cameraTranslate = np.array([-Game.width / 2, -Game.height / 2])  # as in ChasingCamera
+
+        # level data
+        grids = [Grid(os.path.join(config.levelsPath, level), None) for level in levels]
+        self.cellDim = cellDim = int(grids[0].cellDim)
+        ydim = max(g.shape[0] for g in grids)
+        xdim = max(g.shape[1] for g in grids)
+        self.gridShape = (ydim, xdim)
+        self.isPlatform = np.zeros((len(grids), ydim, xdim), dtype=bool)
+        c = gridContext
+        self.paddedChannels = np.zeros((len(grids), 2, ydim + 2 * c, xdim + 2 * c), dtype=np.float64)
+        self.exitCells: List[List[Tuple[int, int]]] = []
+        self.levelInitialPos = np.zeros((len(grids), 2))
+        for i, g in enumerate(grids):
+            h, w = g.shape
+            self.isPlatform[i, :h, :w] = g.cells == Grid.PLATFORM
+            self.paddedChannels[i, 0, c:c+h, c:c+w] = g.cells == Grid.PLATFORM
+            self.paddedChannels[i, 1, c:c+h, c:c+w] = g.cells == Grid.EXIT
+            exitCells = [(int(x), int(y)) for y, x in zip(*np.nonzero(g.cells == Grid.EXIT))]
+            if len(exitCells) == 0:
+                raise ValueError(f"Level {levels[i]} has no exit")
+            self.exitCells.append(exitCells)
+            self.levelInitialPos[i] = g.playerInitialPos()
+        self.levelIndex = np.arange(n) % len(grids)
+        self.exitPos = np.array([[x * cellDim + cellDim // 2, y * cellDim + cellDim // 2] for x, y in
+            (self.exitCells[l][0] for l in self.levelIndex)], dtype=np.int64)
+
+        # action data
+        actions = list(RemoteAction)
+        self.actionLeft = np.array([pygame.K_LEFT in a.getKeys() for a in actions])
+        self.actionRight = np.array([pygame.K_RIGHT in a.getKeys() for a in actions])
+        self.actionUp = np.array([pygame.K_UP in a.getKeys() for a in actions])
+
+        # state arrays
+        self.pos = np.zeros((n, 2))
+        self.vel = np.zeros((n, 2))
+        self.acc = np.zeros((n, 2))
+        self.accFriction = np.zeros((n, 2))
+        self.cameraPos = np.zeros((n, 2))
+        self.cameraInitialised = np.zeros(n, dtype=bool)
+        self.onGround = np.zeros(n, dtype=bool)
+        self.onLeftWall = np.zeros(n, dtype=bool)
+        self.onRightWall = np.zeros(n, dtype=bool)
+        self.onWall = np.zeros(n, dtype=bool)
+        self.left = np.zeros(n, dtype=bool)
+        self.right = np.zeros(n, dtype=bool)
+        self.jump = np.zeros(n, dtype=bool)
+        self.startJump = np.zeros(n, dtype=bool)
+        self.running = np.zeros(n, dtype=bool)
+        self.time = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n)
+        self.bestExitDistanceSteps = np.zeros(n)
+        self.status = np.zeros(n, dtype=np.int8)
+
+        gridContextSize = (2 * gridContext + 1) ** 2
+        self.observationSize = 2 * gridContextSize + 2 + 2 + 2 * 2 + 3
+        self._obs = np.zeros((n, self.observationSize))
+
+        self.reset()
+
+    def reset(self, mask: np.ndarray = None):
+        """
+        Resets instances to the initial state of their level
+
+        :param mask: a boolean array indicating the instances to reset; if None, reset all instances
+        """
+        if mask is None:
+            mask = np.ones(self.numInstances, dtype=bool)
+        self.pos[mask] = self.levelInitialPos[self.levelIndex[mask]]
+        for arr in (self.vel, self.acc, self.accFriction):
+            arr[mask] = 0.0
+        for arr in (self.cameraInitialised, self.onGround, self.onLeftWall, self.onRightWall, self.onWall,
+                self.left, self.right, self.jump, self.startJump, self.running):
+            arr[mask] = False
+        self.time[mask] = 0
+        self.score[mask] = 0.0
+        self.status[mask] = self.STATUS_RUNNING
+        self.bestExitDistanceSteps[mask] = self._exitDistanceSteps()[mask]
+
+    def _exitDistanceSteps(self) -> np.ndarray:
+        offs = self.pos - self.exitPos
+        return np.sqrt(offs[:, 0] * offs[:, 0] + offs[:, 1] * offs[:, 1]) / Game.EXIT_CLOSENESS_STEP_SIZE
+
+    def isOver(self) -> np.ndarray:
+        return self.status != self.STATUS_RUNNING
+
+    def step(self, actionIndices: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Advances all instances by one frame
+
+        :param actionIndices: for each instance, the index of the action (in list(RemoteAction)) to apply
+        :return: a pair (rewards, dones) of arrays with shape (N,)
+        """
+        prevScore = self.score.copy()
+        self._applyActions(np.asarray(actionIndices))
+        self._update()
+        return self.score - prevScore, self.isOver()
+
+    def _applyActions(self, actionIndices: np.ndarray):
+        # apply the key transitions (as generated by VirtualKeyboard and processed by ControlledAvatar)
+        up = self.actionUp[actionIndices]
+        pressedUp = up & ~self.jump
+        self.left = self.actionLeft[actionIndices]
+        self.right = self.actionRight[actionIndices]
+        self.jump = up
+        self.startJump |= pressedUp
+
+        # exiting the level (ControlledAvatar.onKeyDown): the avatar's rect and the exits' rects are compared in
+        # world space
+        aw, ah = Avatar.size
+        cellDim = self.cellDim
+        for i in np.flatnonzero(pressedUp):
+            ax, ay = _rectCoordinate(self.pos[i]).astype(np.int64) - np.array(Avatar.size) // 2
+            for cx, cy in self.exitCells[self.levelIndex[i]]:
+                ex, ey = cx * cellDim, cy * cellDim
+                if ax < ex + cellDim and ay < ey + cellDim and ax + aw > ex and ay + ah > ey:
+                    self.score[i] += Game.SCORE_EXIT
+                    self.status[i] = self.STATUS_OVER_EXIT
+                    break
+
+    def _update(self):
+        # advance time (Game.update)
+        self.time += 1
+        self.score += Game.SCORE_TICK
+        exitDistanceSteps = self._exitDistanceSteps()
+        closer = exitDistanceSteps < self.bestExitDistanceSteps
+        self.score[closer] += Game.SCORE_EXIT_CLOSENESS_PER_STEP * (self.bestExitDistanceSteps[closer] - exitDistanceSteps[closer])
+        self.bestExitDistanceSteps[closer] = exitDistanceSteps[closer]
+
+        # update the camera; a newly created ChasingCamera shares its position array with the avatar, so the first
+        # camera update moves the avatar as well
+        first = ~self.cameraInitialised
+        self.cameraPos[first] = self.pos[first]
+        self.cameraPos += (self.pos + self._cameraTranslate - self.cameraPos) * ChasingCamera.CHASE_FACTOR
+        self.pos[first] = self.cameraPos[first]
+        self.cameraInitialised[:] = True
+
+        # check for death (ControlledAvatar.update)
+        dies = self.vel[:, 1] > ControlledAvatar.DEATH_VEL
+        self.score[dies] += Game.SCORE_DEATH
+        self.status[dies] = self.STATUS_OVER_DEATH
+
+        alive = ~dies
+        if alive.all():
+            self._updateMotion()
+        else:
+            self._updateMotion(alive)
+
+    def _updateMotion(self, mask: np.ndarray = None):
+        """
+        Applies MeatBoyMotion.update to the selected instances
+
+        :param mask: the instances to update; if None, update all instances
+        """
+        sel = slice(None) if mask is None else mask
+        pos, vel, acc, accFriction = self.pos[sel], self.vel[sel], self.acc[sel], self.accFriction[sel]
+        left, right, jump, startJump, running = self.left[sel], self.right[sel], self.jump[sel], self.startJump[sel], self.running[sel]
+        levelIndex = self.levelIndex[sel]
+
+        # update velocity and position
+        vel += MeatBoyMotion.accScale * (acc + np.array([0.0, MeatBoyMotion.grav]) + accFriction)
+        pos += MeatBoyMotion.velScale * vel
+
+        # process platform interaction
+        aw, ah = Avatar.size
+        rectLeft = np.rint(pos[:, 0]).astype(np.int64) - aw // 2
+        rectTop = np.rint(pos[:, 1]).astype(np.int64) - ah // 2
+        self._processPlatformInteraction(levelIndex, pos, vel, acc, rectLeft, rectTop)
+        rectRight, rectBottom = rectLeft + aw, rectTop + ah
+        onGround = self._anyPlatform(levelIndex, rectLeft, rectTop + 1, rectRight, rectBottom + 1)
+        onLeftWall = ~onGround & self._anyPlatform(levelIndex, rectLeft - 1, rectTop, rectRight - 1, rectBottom)
+        onRightWall = ~onGround & ~onLeftWall & self._anyPlatform(levelIndex, rectLeft + 1, rectTop, rectRight + 1, rectBottom)
+        onWall = onLeftWall | onRightWall
+
+        # update velocity and acceleration based on move actions
+        acc[~jump, 1] = 0.0
+        maxHorVel = np.where(running, MeatBoyMotion.maxHorRunVel, MeatBoyMotion.maxHorVel)
+        moving = left | right
+
+        ground = onGround
+        accFriction[ground, 0] = -vel[ground, 0] * MeatBoyMotion.groundFrictionCoeff
+        accFriction[ground, 1] = 0.0
+        acc[ground, 0] = np.where(moving[ground], np.where(right[ground], MeatBoyMotion.groundAcc, -MeatBoyMotion.groundAcc), 0.0)
+        vel[ground, 1] = 0.0
+        groundJump = ground & startJump
+        acc[groundJump, 1] = -MeatBoyMotion.jumpAcc
+        onGround = onGround & ~groundJump
+
+        wall = ~ground & onWall
+        acc[wall, 0] = 0.0
+        accFriction[wall, 0] = 0.0
+        accFriction[wall, 1] = -np.sign(vel[wall, 1]) * MeatBoyMotion.wallFriction
+        wallJump = wall & startJump
+        acc[wallJump, 1] = 0.0
+        vel[wallJump, 0] = np.where(onLeftWall[wallJump], maxHorVel[wallJump], -maxHorVel[wallJump])
+        vel[wallJump, 1] = -MeatBoyMotion.jumpSpeed
+
+        air = ~ground & ~onWall
+        accFriction[air] = 0.0
+        acc[air, 0] = np.where(moving[air], np.where(right[air], MeatBoyMotion.airHorAcc, -MeatBoyMotion.airHorAcc), 0.0)
+
+        tooFast = np.abs(vel[:, 0]) > maxHorVel
+        vel[tooFast, 0] = maxHorVel[tooFast] * np.sign(vel[tooFast, 0])
+        tooFastUp = vel[:, 1] < -MeatBoyMotion.jumpSpeed
+        vel[tooFastUp, 1] = -MeatBoyMotion.jumpSpeed
+        acc[tooFastUp, 1] = 0.0
+
+        # write back
+        self.pos[sel] = np.round(pos)
+        self.vel[sel] = vel
+        self.acc[sel] = acc
+        self.accFriction[sel] = accFriction
+        self.onGround[sel] = onGround
+        self.onLeftWall[sel] = onLeftWall
+        self.onRightWall[sel] = onRightWall
+        self.onWall[sel] = onWall
+        self.startJump[sel] = False
+
+    def _cellWindow(self, levelIndex, left, top, right, bottom):
+        """
+        Determines the (at most 2x2) grid cells overlapped by the given rectangles, which must not be larger than a cell
+
+        :return: a list of triples (x, y, isPlatform) of arrays, one for each corner of the rectangle, in row-major
+            order of the cells
+        """
+        cellDim = self.cellDim
+        ydim, xdim = self.gridShape
+        x0, x1 = left // cellDim, (right - 1) // cellDim
+        y0, y1 = top // cellDim, (bottom - 1) // cellDim
+        result = []
+        for y in (y0, y1):
+            for x in (x0, x1):
+                inBounds = (x >= 0) & (x < xdim) & (y >= 0) & (y < ydim)
+                isPlatform = np.zeros(len(levelIndex), dtype=bool)
+                isPlatform[inBounds] = self.isPlatform[levelIndex[inBounds], y[inBounds], x[inBounds]]
+                result.append((x, y, isPlatform))
+        return result
+
+    def _anyPlatform(self, levelIndex, left, top, right, bottom) -> np.ndarray:
+        result = np.zeros(len(levelIndex), dtype=bool)
+        for _, _, isPlatform in self._cellWindow(levelIndex, left, top, right, bottom):
+            result |= isPlatform
+        return result
+
+    def _processPlatformInteraction(self, levelIndex, pos, vel, acc, rectLeft, rectTop):
+        """
+        Applies MeatBoyMotion.processPlatformInteraction (in-place), i.e. resolves the collisions with platform cells.
+        In MeatBoyMotion, the colliding platforms are processed in order (row-major order of cells), and after each
+        shift of the avatar, only the subsequent platforms that collide with the shifted avatar are considered.
+        Therefore, in each round, each instance processes the first platform cell that collides with the avatar and
+        comes after the previously processed cell.
+        """
+        aw, ah = Avatar.size
+        cellDim = self.cellDim
+        xdim = self.gridShape[1]
+        n = len(levelIndex)
+        lastCell = np.full(n, -1, dtype=np.int64)
+        active = np.ones(n, dtype=bool)
+        while True:
+            rectRight, rectBottom = rectLeft + aw, rectTop + ah
+            nextCell = np.full(n, np.iinfo(np.int64).max)
+            for x, y, isPlatform in self._cellWindow(levelIndex, rectLeft, rectTop, rectRight, rectBottom):
+                cell = y * xdim + x
+                valid = isPlatform & (cell > lastCell)
+                nextCell = np.where(valid & (cell < nextCell), cell, nextCell)
+            active &= nextCell != np.iinfo(np.int64).max
+            if not active.any():
+                break
+            idx = np.flatnonzero(active)
+            cell = nextCell[idx]
+            lastCell[idx] = cell
+            l, t = rectLeft[idx], rectTop[idx]
+            r, b = l + aw, t + ah
+            pl, pt = (cell % xdim) * cellDim, (cell // xdim) * cellDim
+            pr, pb = pl + cellDim, pt + cellDim
+            vx, vy = vel[idx, 0], vel[idx, 1]
+
+            contained = (pl <= l) & (pt <= t) & (pr >= r) & (pb >= b)
+            downShift = np.where((b > pb) & (pb > t) & ~(vy > 0), pb - t, 0)
+            upShift = np.where((b > pt) & (pt > t) & ~(vy < 0), b - pt, 0)
+            leftShift = np.where((r > pl) & (pl > l) & ~(vx < 0), r - pl, 0)
+            rightShift = np.where((l < pr) & (pr < r) & ~(vx > 0), pr - l, 0)
+            shifts = np.stack([leftShift, rightShift, upShift, downShift])
+            minShift = np.where(shifts > 0, shifts, np.iinfo(np.int64).max).min(axis=0)
+            shifting = ~contained & (minShift != np.iinfo(np.int64).max)
+
+            down = shifting & (downShift == minShift)
+            left = shifting & ~down & (leftShift == minShift)
+            right = shifting & ~down & ~left & (rightShift == minShift)
+            up = shifting & ~down & ~left & ~right
+            offsetX = np.where(left, -leftShift, np.where(right, rightShift, 0))
+            offsetY = np.where(down, downShift, np.where(up, -upShift, 0))
+
+            shifted = idx[shifting]
+            pos[shifted, 0] += offsetX[shifting]
+            pos[shifted, 1] += offsetY[shifting]
+            rectLeft[shifted] = _rectCoordinate(pos[shifted, 0]).astype(np.int64) - aw // 2
+            rectTop[shifted] = _rectCoordinate(pos[shifted, 1]).astype(np.int64) - ah // 2
+            vertical = idx[down | up]
+            vel[vertical, 1] = acc[vertical, 1] = 0.0
+            horizontal = idx[left | right]
+            vel[horizontal, 0] = acc[horizontal, 0] = 0.0
+
+    def getObservations(self) -> np.ndarray:
+        """
+        :return: the array of shape (N, observationSize) containing the observations (as computed by agent.Env) of
+            all instances; the array is reused by subsequent calls
+        """
+        obs = self._obs
+        pos = self.pos
+        cellDim = self.cellDim
+        c = self.gridContext
+        d = 2 * c + 1
+        gridContextSize = d * d
+
+        # grid context
+        cell = (pos // cellDim).astype(np.int64)
+        ys = cell[:, 1, None] + np.arange(d)  # offsets into the padded grid (padding c)
+        xs = cell[:, 0, None] + np.arange(d)
+        ydim, xdim = self.gridShape
+        validY = (ys >= 0) & (ys < ydim + 2 * c)
+        validX = (xs >= 0) & (xs < xdim + 2 * c)
+        ysc = np.clip(ys, 0, ydim + 2 * c - 1)
+        xsc = np.clip(xs, 0, xdim + 2 * c - 1)
+        channels = self.paddedChannels[self.levelIndex[:, None, None, None], np.arange(2)[None, :, None, None],
+            ysc[:, None, :, None], xsc[:, None, None, :]]
+        channels *= (validY[:, None, :, None] & validX[:, None, None, :])
+        obs[:, :2 * gridContextSize] = channels.reshape(self.numInstances, 2 * gridContextSize)
+
+        # exit direction
+        i = 2 * gridContextSize
+        exitVector = self.exitPos - pos
+        exitVectorNorm = np.sqrt(exitVector[:, 0] * exitVector[:, 0] + exitVector[:, 1] * exitVector[:, 1])
+        obs[:, i:i+2] = np.divide(exitVector, exitVectorNorm[:, None], out=np.zeros((self.numInstances, 2)),
+            where=exitVectorNorm[:, None] != 0)
+
+        # position offset in cell
+        obs[:, i+2:i+4] = (pos % cellDim) / cellDim
+
+        # velocity and acceleration
+        obs[:, i+4:i+6] = (self.vel * MeatBoyMotion.velScale) / FeatureObservationBuilder.MOTION_SCALE
+        obs[:, i+6:i+8] = (MeatBoyMotion.accScale * (self.acc + np.array([0.0, MeatBoyMotion.grav]) + self.accFriction)) / FeatureObservationBuilder.MOTION_SCALE
+
+        # motion flags
+        obs[:, i+8] = self.onLeftWall
+        obs[:, i+9] = self.onRightWall
+        obs[:, i+10] = self.onGround
+        return obs
@@ -2,22 +2,47 @@ import pygame
 import numpy
 
 
-class CenteringCamera(pygame.sprite.Sprite):
+class Camera(pygame.sprite.Sprite):
+    ''' base class for cameras, whose state is given by their position '''
+
+    def saveState(self, game) -> tuple:
+        # a new camera shares its position with the avatar (see ChasingCamera), which must be retained
+        return self.pos.copy(), self.pos is game.avatar.pos
+
+    def restoreState(self, state: tuple, game):
+        pos, sharesAvatarPos = state
+        if sharesAvatarPos:
+            self.pos = game.avatar.pos
+            self.pos[:] = pos
+        else:
+            self.pos = pos.copy()
+
+
+class CenteringCamera(Camera):
     ''' a basic camera that always centres the camera on the player '''
     
     def __init__(self, game):
         self.translate = numpy.array([-game.width/2, -game.height/2])
+        self.reset(game)
+
+    def reset(self, game):
+        self.pos = game.avatar.pos + self.translate
         
     def update(self, game):        
         self.pos = game.avatar.pos + self.translate
 
 
-class ChasingCamera(pygame.sprite.Sprite):
+class ChasingCamera(Camera):
     ''' a basic chasing camera '''
+
+    CHASE_FACTOR = 0.03  # the fraction of the offset to the target position that is covered in each frame
     
     def __init__(self, game):
         self.translate = numpy.array([-game.width/2, -game.height/2])
+        self.reset(game)
+
+    def reset(self, game):
         self.pos = game.avatar.pos
         
     def update(self, game):        
-        self.pos += (game.avatar.pos + self.translate - self.pos) *0.03
\ No newline at end of file
+        self.pos += (game.avatar.pos + self.translate - self.pos) * self.CHASE_FACTOR
\ No newline at end of file
@@ -0,0 +1,189 @@
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Sequence, TYPE_CHECKING, Iterable, List, Iterator, Dict, Tuple, Optional
+
+import numpy as np
+from pygame import Rect
+
+if TYPE_CHECKING:
+    from .objects import Platform
+
+
+class PlatformRects:
+    """
+    Represents the (world-space) collision rectangles of a level's platforms as contiguous arrays, enabling collision
+    tests against all platforms at once. The order is retained, i.e. index i refers to the i-th rectangle/platform
+    of the sequences the instance was created from.
+    """
+    def __init__(self, platforms: Sequence["Platform"], rects: Optional[Sequence[Rect]] = None):
+        """
+        :param platforms: the platforms
+        :param rects: the collision rectangles, where rects[i] is a part of platforms[i] (such that a platform may
+            appear several times in platforms); if None, use the platforms' rectangles
+        """
+        self.platforms = list(platforms)
+        self.rects = [p.wrect for p in self.platforms] if rects is None else list(rects)
+        self.platformIndices = defaultdict(list)
+        for i, p in enumerate(self.platforms):
+            self.platformIndices[p].append(i)
+        self.rectTuples = [(r.left, r.top, r.right, r.bottom) for r in self.rects]
+        rects = np.array(self.rectTuples, dtype=np.int64).reshape((len(self.rects), 4))
+        self.left = np.ascontiguousarray(rects[:, 0])
+        self.top = np.ascontiguousarray(rects[:, 1])
+        self.right = np.ascontiguousarray(rects[:, 2])
+        self.bottom = np.ascontiguousarray(rects[:, 3])
+        self.visible = np.array([p.visible for p in self.platforms], dtype=bool)
+
+    def __len__(self):
+        return len(self.platforms)
+
+    def updateVisibility(self, platform: "Platform"):
+        for i in self.platformIndices[platform]:
+            self.visible[i] = platform.visible
+
+    def colliding(self, left, top, right, bottom, start=0, visibleOnly=False) -> np.ndarray:
+        """
+        Finds the platforms colliding with the given rectangle (using the semantics of pygame's Rect.colliderect)
+
+        :param left: the rectangle's left coordinate
+        :param top: the rectangle's top coordinate
+        :param right: the rectangle's right coordinate
+        :param bottom: the rectangle's bottom coordinate
+        :param start: the index of the first platform to consider
+        :param visibleOnly: whether to consider only visible platforms
+        :return: the sorted array of indices of colliding platforms
+        """
+        mask = (self.left[start:] < right) & (self.right[start:] > left) & (self.top[start:] < bottom) & (self.bottom[start:] > top)
+        if visibleOnly:
+            mask &= self.visible[start:]
+        indices = np.flatnonzero(mask)
+        if start != 0:
+            indices += start
+        return indices
+
+
+class CollisionIndex(ABC):
+    """
+    Spatial index over the platforms of a level, which answers collision queries in time that does not depend on
+    the total number of platforms
+    """
+    def __init__(self, platformRects: PlatformRects):
+        self.platformRects = platformRects
+
+    @abstractmethod
+    def _candidates(self, left, top, right, bottom) -> Iterable[int]:
+        """
+        :return: the indices of the platforms that potentially collide with the given rectangle (a superset of the
+            actually colliding platforms, in arbitrary order and possibly with duplicates)
+        """
+        pass
+
+    def colliding(self, left, top, right, bottom, start=0, visibleOnly=False) -> List[int]:
+        """
+        Finds the platforms colliding with the given rectangle (using the semantics of pygame's Rect.colliderect)
+
+        :param left: the rectangle's left coordinate
+        :param top: the rectangle's top coordinate
+        :param right: the rectangle's right coordinate
+        :param bottom: the rectangle's bottom coordinate
+        :param start: the index of the first platform to consider
+        :param visibleOnly: whether to consider only visible platforms
+        :return: the sorted list of indices of colliding platforms
+        """
+        rectTuples = self.platformRects.rectTuples
+        visible = self.platformRects.visible
+        result = []
+        for i in set(self._candidates(left, top, right, bottom)):
+            if i < start or (visibleOnly and not visible[i]):
+                continue
+            pLeft, pTop, pRight, pBottom = rectTuples[i]
+            if pLeft < right and pRight > left and pTop < bottom and pBottom > top:
+                result.append(i)
+        result.sort()
+        return result
+
+    def anyColliding(self, left, top, right, bottom) -> bool:
+        rectTuples = self.platformRects.rectTuples
+        for i in self._candidates(left, top, right, bottom):
+            pLeft, pTop, pRight, pBottom = rectTuples[i]
+            if pLeft < right and pRight > left and pTop < bottom and pBottom > top:
+                return True
+        return False
+
+    def iterColliding(self, rect: Rect) -> Iterator[int]:
+        """
+        Lazily iterates over the indices of the platforms colliding with the given rectangle (in platform order).
+        Like filter(lambda p: rect.colliderect(p.wrect), platforms), the rectangle may be moved during the iteration,
+        in which case the remaining platforms are tested against the moved rectangle.
+
+        :param rect: the rectangle
+        """
+        pos = rect.topleft
+        candidates = self.colliding(rect.left, rect.top, rect.right, rect.bottom)
+        k = 0
+        while k < len(candidates):
+            i = candidates[k]
+            k += 1
+            yield i
+            if rect.topleft != pos:
+                pos = rect.topleft
+                candidates = self.colliding(rect.left, rect.top, rect.right, rect.bottom, start=i + 1)
+                k = 0
+
+
+class BucketCollisionIndex(CollisionIndex):
+    """
+    Collision index for platforms of arbitrary size and position, which registers each platform in the buckets of a
+    uniform grid that it overlaps
+    """
+    def __init__(self, platformRects: PlatformRects, bucketSize: int = 128):
+        super().__init__(platformRects)
+        self.bucketSize = bucketSize
+        self.buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for i, (left, top, right, bottom) in enumerate(platformRects.rectTuples):
+            for bx in range(left // bucketSize, (right - 1) // bucketSize + 1):
+                for by in range(top // bucketSize, (bottom - 1) // bucketSize + 1):
+                    self.buckets[(bx, by)].append(i)
+        self.buckets = dict(self.buckets)
+
+    def _candidates(self, left, top, right, bottom) -> Iterable[int]:
+        bucketSize = self.bucketSize
+        buckets = self.buckets
+        for bx in range(left // bucketSize, (right - 1) // bucketSize + 1):
+            for by in range(top // bucketSize, (bottom - 1) // bucketSize + 1):
+                bucket = buckets.get((bx, by))
+                if bucket is not None:
+                    yield from bucket
+
+
+class GridCellCollisionIndex(CollisionIndex):
+    """
+    Collision index for grid-based levels, where each collision rectangle is exactly one grid cell; the rectangles
+    colliding with a query rectangle are looked up directly in the cells it overlaps
+    """
+    def __init__(self, platformRects: PlatformRects, gridShape: Tuple[int, int], cellDim: int):
+        """
+        :param platformRects: the platform collision rectangles, each of which must coincide with a grid cell
+        :param gridShape: the shape (ydim, xdim) of the grid
+        :param cellDim: the side length of grid cells
+        """
+        super().__init__(platformRects)
+        self.cellDim = cellDim
+        self.ydim, self.xdim = gridShape
+        self.cellPlatformIndices = [[-1] * self.xdim for _ in range(self.ydim)]
+        for i, (left, top, right, bottom) in enumerate(platformRects.rectTuples):
+            x, y = left // cellDim, top // cellDim
+            if (x * cellDim, y * cellDim, (x + 1) * cellDim, (y + 1) * cellDim) != (left, top, right, bottom):
+                raise ValueError(f"Platform rectangle {(left, top, right, bottom)} does not coincide with a grid cell")
+            self.cellPlatformIndices[y][x] = i
+
+    def _candidates(self, left, top, right, bottom) -> Iterable[int]:
+        cellDim = self.cellDim
+        x0 = max(left // cellDim, 0)
+        x1 = min((right - 1) // cellDim, self.xdim - 1)
+        for y in range(max(top // cellDim, 0), min((bottom - 1) // cellDim, self.ydim - 1) + 1):
+            row = self.cellPlatformIndices[y]
+            for x in range(x0, x1 + 1):
+                i = row[x]
+                if i != -1:
+                    yield i
@@ -1,27 +1,105 @@
-import traceback
-import os
+import logging
+from typing import Dict
+
+LOG_FORMAT = "%(module)10s:%(lineno)-5d> %(message)s"
+
+
+class _Message(object):
+    """
+    A log message consisting of several parts, which are converted to strings and joined only if the message is
+    actually emitted
+    """
+    __slots__ = ("parts", "indent")
+
+    def __init__(self, parts, indent):
+        self.parts = parts
+        self.indent = indent
+
+    def __str__(self):
+        return ' ' * self.indent + ' '.join([str(x) for x in self.parts])
+
 
 class Logger(object):
-    def __init__(self, enabled = True, **settings):
+    """
+    Forwards messages to a logger of Python's logging module. Calls for which logging is disabled (via the settings
+    stack or the logging level of the logger's module) return immediately, without formatting the message parts.
+    """
+    def __init__(self, name="game", enabled=True, level=logging.INFO, **settings):
+        """
+        :param name: the name of the underlying logger (usually the module's __name__)
+        :param enabled: whether logging is initially enabled
+        :param level: the level at which messages passed to __call__ are logged
+        :param settings: further settings (indent)
+        """
+        self.logger = logging.getLogger(name)
+        self.level = level
         self.stack = []
         self.indent = 0
+        self.enabled = enabled
         self.push(enabled, **settings)
-    
+
     def push(self, enabled=None, **settings):
         if enabled is None: enabled = self.stack[-1][0]
         self.stack.append((enabled, settings))
+        self.enabled = enabled
         self.indent += settings.get("indent", 0)
-    
+
     def pop(self, n=1):
         while n > 0:
             settings = self.stack.pop()[1]
             self.indent -= settings.get("indent", 0)
             n -= 1
+        self.enabled = self.stack[-1][0]
+
+    def isEnabledFor(self, level) -> bool:
+        """
+        :param level: the logging level
+        :return: whether messages of the given level are emitted; can be used to guard expensive computations
+            which are only required for logging
+        """
+        return self.enabled and self.logger.isEnabledFor(level)
 
     def __call__(self, *messages):
-        enabled, settings = self.stack[-1]
-        if not enabled: return
-        (module, line, f, _) = traceback.extract_stack()[-2]
-        print('%10s:%-5d> %s%s' % (os.path.split(module)[-1].replace(".py", ""), line, ' '*self.indent, ' '.join([str(x) for x in messages])))
+        if self.enabled and self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, _Message(messages, self.indent), stacklevel=2)
+
+    def debug(self, *messages):
+        if self.enabled and self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.log(logging.DEBUG, _Message(messages, self.indent), stacklevel=2)
+
+
+_loggers: Dict[str, Logger] = {}
+
+
+def getLogger(name: str) -> Logger:
+    """
+    :param name: the logger name (usually the module's __name__), which determines, via the logging module's
+        hierarchy of loggers, the level at which messages are emitted
+    :return: the logger
+    """
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = _loggers[name] = Logger(name)
+    return logger
+
+
+def setLevel(name: str, level):
+    """
+    Sets the logging level for the given module (or package)
+
+    :param name: the module or package name, e.g. "game.objects.avatar.motion"
+    :param level: the logging level
+    """
+    logging.getLogger(name).setLevel(level)
+
+
+def configureLogging(level=logging.INFO):
+    """
+    Configures the logging module to write messages of the given level (and above) to the console
+
+    :param level: the root logging level
+    """
+    logging.basicConfig(level=level, format=LOG_FORMAT)
+
 
-log = Logger()
\ No newline at end of file
+log = getLogger("game")
@@ -14,7 +14,9 @@ class EventHandler(object):
     
     def unbindAll(self):
         self.bindings = defaultdict(list)
-        self.game.removeEventHandler(self)
+        if self.hasBindings:
+            self.hasBindings = False
+            self.game.removeEventHandler(self)
 
     def handleEvent(self, event):    
         for handler in self.bindings.get(event.type, []):        
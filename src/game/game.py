@@ -1,6 +1,7 @@
 import os
 from enum import Enum
-from typing import Optional, Union, List
+from time import perf_counter
+from typing import Optional, Union, List, NamedTuple, Tuple
 
 import numpy as np
 import pygame
@@ -8,13 +9,17 @@ from pygame import sprite
 from pygame.locals import K_ESCAPE
 
 from . import config
+from .assets import getAssetCache
 from .camera import ChasingCamera
-from .debug import log
+from .debug import getLogger
 from .events import EventHandler
 from .level import Level, loadLevel, GridLevel
 from .objects import ControlledAvatar, Ghost
-from .remote_control import RemoteActionEventGenerator, RemoteAction, RemoteController
-from .renderer import GameRenderer
+from .profiler import FrameProfiler
+from .remote_control import RemoteAction, RemoteController
+from .renderer import GameRenderer, RenderMode
+
+log = getLogger(__name__)
 
 
 class LevelStatus(Enum):
@@ -26,6 +31,26 @@ class LevelStatus(Enum):
         return self in (self.OVER_EXIT, self.OVER_DEATH)
 
 
+class GameState(NamedTuple):
+    """
+    A snapshot of the complete dynamic state of a game (see Game.saveState), which is immutable and can thus be
+    restored any number of times. Objects (level, avatar, ghosts) are referenced rather than copied, their dynamic
+    state being held separately.
+    """
+    level: Level
+    levelIdx: int
+    levelStatus: LevelStatus
+    time: int
+    score: float
+    bestExitDistanceSteps: float
+    levelState: tuple
+    avatar: ControlledAvatar
+    avatarState: tuple
+    ghosts: Tuple[Tuple[Ghost, object], ...]  # pairs (ghost, position)
+    cameraState: tuple
+    eventQueue: tuple
+
+
 class Game(EventHandler):
     width = 800
     height = 600
@@ -37,21 +62,43 @@ class Game(EventHandler):
     SCORE_EXIT_CLOSENESS_PER_STEP = 10
     EXIT_CLOSENESS_STEP_SIZE = 40
 
-    def __init__(self, levels: Union[Union[str, Level], List[Union[str, Level]]], enableRendering=True):
-        log(f"Initialising game")
+    def __init__(self, levels: Union[Union[str, Level], List[Union[str, Level]]], enableRendering=True, fastMotion=False,
+            renderMode: RenderMode = RenderMode.CULLED):
+        """
+        Creates a game. A process can host any number of game instances, which are independent of each other, but
+        since there is only one display, at most one of them should render.
+
+        :param levels: the level(s) to play, given as filenames (relative to the levels directory) or Level instances;
+            Level instances must not be shared between games
+        :param enableRendering: whether to render the game to a display; if False, the game runs headless, i.e. no display
+            is created and game objects do not allocate any images or surfaces
+        :param fastMotion: whether to use FastMeatBoyMotion (rather than MeatBoyMotion) as the avatar's motion engine;
+            both engines produce identical trajectories
+        :param renderMode: the mode in which the renderer draws (see RenderMode); both modes produce
+            identical frames, except that invisible platforms are only drawn in FULL mode
+        """
+        log("Initialising game")
         EventHandler.__init__(self, self)
         
-        pygame.init()
         self.enableRendering = enableRendering
+        self.fastMotion = fastMotion
+        self.renderMode = renderMode
         self.renderer = None
         self.level: Optional[Level] = None
         self.timer = pygame.time.Clock()
-        self.screen = pygame.display.set_mode((Game.width, Game.height))
         self.isRunning = True
         self.levelStatus = LevelStatus.RUNNING
         self.remoteController: Optional[RemoteController] = None
-        pygame.display.set_caption("Tempus Temporis [prototype]")
-        self.width, self.height = self.screen.get_size()
+        self.profiler: Optional[FrameProfiler] = None
+        self.eventQueue = []  # events posted to this game instance (see postEvent)
+        if enableRendering:
+            pygame.init()
+            self.screen = pygame.display.set_mode((Game.width, Game.height))
+            pygame.display.set_caption("Tempus Temporis [prototype]")
+            self.width, self.height = self.screen.get_size()
+            getAssetCache().preload()
+        else:
+            self.screen = None
 
         # only for logging purposes
         self.maxAbsVel = np.array([0,0])
@@ -73,7 +120,25 @@ class Game(EventHandler):
         self.levelIdx = 0
         self.startLevel(levels[0])
 
+    def enableProfiling(self, windowSize: int = 1000) -> FrameProfiler:
+        """
+        Enables the recording of frame times (see FrameProfiler); frames are completed by the main loop or, if the
+        game is stepped externally, via endFrame
+
+        :param windowSize: the number of most recent frames from which the profiler computes statistics
+        :return: the profiler
+        """
+        self.profiler = FrameProfiler(windowSize=windowSize, physicsSpriteTypes=(ControlledAvatar,))
+        return self.profiler
+
+    def endFrame(self):
+        if self.profiler is not None:
+            self.profiler.endFrame()
+
     def update(self):
+        if self.profiler is not None:
+            t = perf_counter()
+
         # advance time
         self.time += 1
         self.score += self.SCORE_TICK
@@ -84,27 +149,40 @@ class Game(EventHandler):
             self.score += self.SCORE_EXIT_CLOSENESS_PER_STEP * stepsCloser
             self.bestExitDistanceSteps = exitDistanceSteps
 
+        # the camera update is part of the simulation, as a new camera shares its position with the avatar
         self.camera.update(self)
-        self.renderer.update(self)
+        if self.profiler is None:
+            self.dynamicSprites.update(self)
+        else:
+            self.profiler.profileSpriteUpdates(self.dynamicSprites.sprites(), self)
+        if self.enableRendering:
+            self.renderer.updateScreenRects(self)
 
         #self._logState()
 
+        if self.profiler is not None:
+            self.profiler.record(FrameProfiler.PHASE_SPRITES, perf_counter() - t)
+
     def draw(self):
         if self.enableRendering:
+            if self.profiler is not None:
+                t = perf_counter()
             self.renderer.draw()
+            if self.profiler is not None:
+                self.profiler.record(FrameProfiler.PHASE_RENDER, perf_counter() - t)
 
     def _logState(self):
         vel = self.avatar.motion.velocityVector()
         acc = self.avatar.motion.accelerationVector()
         self.maxAbsVel = np.maximum(np.abs(vel), self.maxAbsVel)
         self.maxAbsAcc = np.maximum(np.abs(acc), self.maxAbsAcc)
-        log(f"vel={vel}, acc={acc}, max(abs(vel))={self.maxAbsVel}, max(abs(acc))={self.maxAbsAcc}")
+        log("vel:", vel, "acc:", acc, "max(abs(vel)):", self.maxAbsVel, "max(abs(acc)):", self.maxAbsAcc)
         if isinstance(self.level, GridLevel):
             level = self.level
             cell = level.grid.gridCellForPos(self.avatar.pos)
-            log(f"Grid cell: {cell}")
-            log(f"Offset on cell: {level.grid.offsetInCell(self.avatar.pos)}")
-            log(f"Surroundings:\n{self.level.grid.surroundingGrid(cell, 5, 5, 5, 5)}")
+            log("Grid cell:", cell)
+            log("Offset in cell:", level.grid.offsetInCell(self.avatar.pos))
+            log("Surroundings:\n", self.level.grid.surroundingGrid(cell, 5, 5, 5, 5))
 
     def createAvatars(self):        
         self.avatar = ControlledAvatar(self.level.playerInitialPos, self)
@@ -122,17 +200,23 @@ class Game(EventHandler):
         self.renderer = GameRenderer(self)
         self.renderer.add(self.level)
         self.renderer.add(self.avatars)
+        # the sprites to update in each frame (static objects are only updated for rendering, see GameRenderer)
+        self.dynamicSprites = sprite.Group(self.level.dynamicObjects, self.avatars)
+        self.ghosts: List[Ghost] = []
+        self._levelAvatar = self.avatar  # the avatar the level was started with (see resetLevel)
 
-        self.levelStatus = LevelStatus.RUNNING
-        self.score = 0
-        self.time = 0
-        self.bestExitDistanceSteps = self.existDistanceSteps()
-        
+        self._initLevelState()
         self.camera = ChasingCamera(self)
 
         if self.remoteController is not None:
             self.remoteController.reset()
 
+    def _initLevelState(self):
+        self.levelStatus = LevelStatus.RUNNING
+        self.score = 0
+        self.time = 0
+        self.bestExitDistanceSteps = self.existDistanceSteps()
+
     def existDistanceSteps(self):
         offs = self.avatar.pos - self.level.exits.sprites()[0].pos
         dist = np.linalg.norm(offs)
@@ -142,15 +226,71 @@ class Game(EventHandler):
         # add ghost
         ghost = Ghost(self.avatar)
         self.renderer.add(ghost)        
+        self.dynamicSprites.add(ghost)
+        self.ghosts.append(ghost)
         
         # replace avatar
         self.avatar.kill()        
         self.avatar = ControlledAvatar(self.level.playerInitialPos, self)
         self.avatars.add(self.avatar)
         self.renderer.add(self.avatar) # TODO should this be necessary?
+        self.dynamicSprites.add(self.avatar)
         
         self.time = 0
 
+    def saveState(self) -> GameState:
+        """
+        Saves the game's complete dynamic state, which can later be restored via restoreState, e.g. in order to
+        explore several continuations from the same state. Saving takes constant time (the avatar's timeline
+        being a persistent data structure).
+
+        :return: the state
+        """
+        return GameState(self.level, self.levelIdx, self.levelStatus, self.time, self.score,
+            self.bestExitDistanceSteps, self.level.saveState(), self.avatar, self.avatar.saveState(),
+            tuple([(g, g.pos) for g in self.ghosts]), self.camera.saveState(self), tuple(self.eventQueue))
+
+    def restoreState(self, state: GameState):
+        """
+        Restores a state previously returned by saveState
+
+        :param state: the state
+        """
+        if state.level is not self.level:
+            self.startLevel(state.level)
+        self.levelIdx = state.levelIdx
+        self.levelStatus = state.levelStatus
+        self.time = state.time
+        self.score = state.score
+        self.bestExitDistanceSteps = state.bestExitDistanceSteps
+        self.level.restoreState(state.levelState)
+        if state.avatar is not self.avatar or len(state.ghosts) != len(self.ghosts) \
+                or any(g is not sg for g, (sg, _) in zip(self.ghosts, state.ghosts)):
+            self._restoreSprites(state.avatar, [g for g, _ in state.ghosts])
+        for g, pos in state.ghosts:
+            g.pos = pos
+        self.avatar.restoreState(state.avatarState)
+        self.camera.restoreState(state.cameraState, self)
+        self.eventQueue[:] = state.eventQueue
+
+    def _restoreSprites(self, avatar: ControlledAvatar, ghosts: List[Ghost]):
+        # remove the current avatar and ghosts unless they are part of the state to restore
+        for s in [self.avatar] + self.ghosts:
+            if s is not avatar and s not in ghosts:
+                s.kill()
+
+        # add the avatar and ghosts to restore (unless they are present)
+        for s in ghosts + [avatar]:
+            if not self.dynamicSprites.has(s):
+                self.renderer.add(s)
+                self.dynamicSprites.add(s)
+        if not self.avatars.has(avatar):
+            self.avatars.add(avatar)
+            avatar.unbindAll()
+            avatar.bindControls()
+        self.avatar = avatar
+        self.ghosts = list(ghosts)
+
     def playerDies(self):
         log("player has died")
         self.score += self.SCORE_DEATH
@@ -161,34 +301,86 @@ class Game(EventHandler):
         self.levelStatus = LevelStatus.OVER_EXIT
         
     def resetLevel(self):
-        self.startLevel(self.level)
+        """
+        Restarts the current level. Unless the avatar was replaced (by travelling back in time), this restores the
+        initial state of the existing objects (avatar, motion, camera, level objects and score) without any object
+        construction or file I/O, which is equivalent to (but much faster than) starting the level anew.
+        """
+        if self.avatar is not self._levelAvatar or len(self.ghosts) > 0:
+            self.startLevel(self.level)
+            return
+        log("restarting level")
+        self.level.reset()
+        self.avatar.reset()
+        self._initLevelState()
+        self.camera.reset(self)
+        if self.remoteController is not None:
+            self.remoteController.reset()
     
     def addEventHandler(self, eventHandler):
         self.eventHandlers.append(eventHandler)
     
     def removeEventHandler(self, eventHandler):
-        self.eventHandlers.remove(eventHandler)
+        if eventHandler in self.eventHandlers:  # handlers are discarded when a level is started
+            self.eventHandlers.remove(eventHandler)
     
+    def postEvent(self, event: pygame.event.Event):
+        """
+        Posts an event to this game instance, which is processed in the next call to processDataStreams
+        (events are not routed through pygame's process-global event queue)
+
+        :param event: the event
+        """
+        self.eventQueue.append(event)
+
+    def _getEvents(self) -> list:
+        events = self.eventQueue
+        self.eventQueue = []
+        if self.enableRendering:
+            # a rendering game owns the display and therefore receives the events of the display (user input)
+            events.extend(pygame.event.get())
+        return events
+
     def processDataStreams(self):
+        if self.profiler is not None:
+            t = perf_counter()
+
         if self.remoteController is not None:
-            for e in self.remoteController.generateEvents():
-                pygame.event.post(e)
+            self.avatar.applyAction(self.remoteController.chooseAction())
 
-        for event in pygame.event.get():
+        for event in self._getEvents():
             if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == K_ESCAPE):
                 self.isRunning = False
                 break
             for eh in self.eventHandlers:
                 eh.handleEvent(event)
 
+        if self.profiler is not None:
+            self.profiler.record(FrameProfiler.PHASE_EVENTS, perf_counter() - t)
+
     def checkLevelChange(self):
         if self.levelStatus == LevelStatus.OVER_DEATH:
-            log(f"Level ended with death, score={self.score}; restarting level")
+            log("Level ended with death; restarting level; score:", self.score)
             self.resetLevel()
         elif self.levelStatus == LevelStatus.OVER_EXIT:
-            log(f"Level ended with success, score={self.score}")
+            log("Level ended with success; score:", self.score)
             self.levelIdx = (self.levelIdx + 1) % len(self.levels)
-            self.startLevel(self.levels[self.levelIdx])
+            if self.levels[self.levelIdx] is self.level:
+                self.resetLevel()
+            else:
+                self.startLevel(self.levels[self.levelIdx])
+
+    def tick(self):
+        """
+        Waits for the next frame (limiting the frame rate) and completes the current frame
+        """
+        if self.profiler is not None:
+            t = perf_counter()
+            self.timer.tick(self.FRAME_RATE)
+            self.profiler.record(FrameProfiler.PHASE_TICK, perf_counter() - t)
+            self.profiler.endFrame()
+        else:
+            self.timer.tick(self.FRAME_RATE)
 
     def mainLoop(self):
         while self.isRunning:
@@ -196,11 +388,10 @@ class Game(EventHandler):
             self.processDataStreams()
             self.update()
             self.draw()
-            self.timer.tick(self.FRAME_RATE)
+            self.tick()
 
     def mainLoopRemoteControlledTest(self):
         frame = 0
-        actionGen = RemoteActionEventGenerator()
         while self.isRunning:
             self.checkLevelChange()
             if frame <= 10:
@@ -209,12 +400,10 @@ class Game(EventHandler):
                 action = RemoteAction.RIGHT_UP
             else:
                 action = RemoteAction.RIGHT
-            events = actionGen.actionToEvents(action)
-            for e in events:
-                pygame.event.post(e)
+            self.avatar.applyAction(action)
             self.processDataStreams()
             self.update()
             self.draw()
-            self.timer.tick(self.FRAME_RATE)
+            self.tick()
             frame += 1
-        log(f"the game is over, score={self.score}")
+        log("the game is over; score:", self.score)
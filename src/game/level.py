@@ -1,23 +1,32 @@
 import sys
 import pickle
-from typing import Iterator
+from typing import Iterator, Optional, Tuple, List, Dict, Set
 
 import numpy as np
 
 from leveledit_redo.levelformat import LevelFormat
+from .collision import PlatformRects, CollisionIndex, BucketCollisionIndex, GridCellCollisionIndex
 from .objects import *
 from leveledit_redo import levelformat
 from pygame import sprite
-from .renderer import LayeredRenderer
+from .observation import LevelRaster
+from .renderer import LayeredRenderer, StaticLevelLayer
 
 sys.modules["levelformat"] = levelformat  # for backward compatibility with pickled files
 
 
 class Level(LayeredRenderer):
     def __init__(self, playerInitialPos: Tuple[float, float]):
+        self._platformRects: Optional[PlatformRects] = None
+        self._collisionIndex: Optional[CollisionIndex] = None
+        self._staticLayer: Optional[StaticLevelLayer] = None
+        self._rasters: Dict[int, LevelRaster] = {}
+        self._switchedPlatforms: Set[Platform] = set()  # the platforms whose visibility differs from the default
         LayeredRenderer.__init__(self)
 
+        self.path: Optional[str] = None  # the file the level was loaded from (if any)
         self.groups = {}
+        self.dynamicObjects = sprite.Group()  # the objects which are not static (see GameObject.isStatic)
         self.platforms = self.addGroup(Platform)
         self.exits = self.addGroup(Exit)
         self.portals = self.addGroup(Portal)
@@ -29,10 +38,32 @@ class Level(LayeredRenderer):
         return group
     
     def reset(self):    
-        for group in (self.platforms, self.portals):
-            for sprite in group.sprites():
-                sprite.reset()
+        for sprite in list(self._switchedPlatforms) + self.portals.sprites():
+            sprite.reset()
         #self.exit.reset()
+
+    def saveState(self) -> tuple:
+        """
+        :return: the state of the level's objects (platform visibility and portal activation)
+        """
+        return frozenset(self._switchedPlatforms), tuple([p.activated for p in self.portals])
+
+    def restoreState(self, state: tuple):
+        """
+        :param state: a state previously returned by saveState
+        """
+        switchedPlatforms, portalActivation = state
+        if switchedPlatforms != self._switchedPlatforms:
+            for p in self._switchedPlatforms - switchedPlatforms:
+                p.visible = p.default
+            for p in switchedPlatforms - self._switchedPlatforms:
+                p.visible = not p.default
+        for p, activated in zip(self.portals, portalActivation):
+            if p.activated != activated:
+                if activated:
+                    p.activate()
+                else:
+                    p.deactivate()
     
     def add(self, *objects):
         LayeredRenderer.add(self, *objects)
@@ -44,6 +75,67 @@ class Level(LayeredRenderer):
                     group.add(object)
                     haveGroup = True
             if not haveGroup: raise Exception("no group for " + str(object))
+            if not object.isStatic:
+                self.dynamicObjects.add(object)
+            else:
+                self._staticLayer = None
+                self._rasters = {}
+            if isinstance(object, Platform):
+                object.level = self
+                self._platformRects = None
+                self._collisionIndex = None
+
+    def getPlatformRects(self) -> PlatformRects:
+        """
+        :return: the contiguous array representation of the level's platform rectangles
+        """
+        if self._platformRects is None:
+            self._platformRects = self._createPlatformRects()
+        return self._platformRects
+
+    def _createPlatformRects(self) -> PlatformRects:
+        return PlatformRects(self.platforms.sprites())
+
+    def getCollisionIndex(self) -> CollisionIndex:
+        """
+        :return: the spatial index with which to determine the platforms colliding with a rectangle
+        """
+        if self._collisionIndex is None:
+            self._collisionIndex = self._createCollisionIndex()
+        return self._collisionIndex
+
+    def _createCollisionIndex(self) -> CollisionIndex:
+        return BucketCollisionIndex(self.getPlatformRects())
+
+    def getStaticLayer(self) -> StaticLevelLayer:
+        """
+        :return: the pre-rendered layer of the level's static objects (only applicable if rendering is enabled)
+        """
+        if self._staticLayer is None:
+            self._staticLayer = StaticLevelLayer([o for o in self.sprites() if o.isStatic])
+        return self._staticLayer
+
+    def getRaster(self, scale: int) -> LevelRaster:
+        """
+        :param scale: the side length (in world pixels) of a raster cell
+        :return: the downsampled rasterisation of the level's static objects (which is created once per scale)
+        """
+        raster = self._rasters.get(scale)
+        if raster is None:
+            raster = self._rasters[scale] = LevelRaster(self, scale)
+        return raster
+
+    def onPlatformVisibilityChanged(self, platform: Platform):
+        if platform.visible != platform.default:
+            self._switchedPlatforms.add(platform)
+        else:
+            self._switchedPlatforms.discard(platform)
+        if self._platformRects is not None:
+            self._platformRects.updateVisibility(platform)
+        if self._staticLayer is not None:
+            self._staticLayer.invalidate(platform)
+        for raster in self._rasters.values():
+            raster.onPlatformVisibilityChanged(platform)
     
     def saveFormat(self):
         return {
@@ -62,6 +154,7 @@ class LevelFromPickleV1(Level):
         levelFormat: LevelFormat
         playerInitialPos = levelFormat.player.rect.center
         super().__init__(playerInitialPos)
+        self.path = path
         self.add(*[Platform(p, game) for p in levelFormat.platforms])
         self.add(Exit(levelFormat.exit, game))
         self.add(*[Portal(p, game) for p in levelFormat.buttons])
@@ -76,6 +169,7 @@ class LevelFromPickleV2(Level):
             d = pickle.load(f)
         d: dict
         super().__init__(d["playerInitialPos"])
+        self.path = path
         for o in d["objects"]:
             gameObject = GameObject.fromSaveFormat(o, game)
             self.add(gameObject)
@@ -83,30 +177,42 @@ class LevelFromPickleV2(Level):
 
 class Grid:
     """
-    Represents a grid-based level layout defined through a text file
+    Represents a grid-based level layout defined through a text file, where each cell is represented by the (ASCII)
+    code of its character
     """
+    EMPTY = ord(" ")
+    PLATFORM = ord("X")
+    EXIT = ord("E")
+    PLAYER = ord("P")
+
     def __init__(self, path: str, game, cellDim: float = 40):
         with open(path, "r") as f:
             lines = [l.rstrip() for l in f.readlines()]
         ydim = len(lines)
-        xdim = max(*[len(l) for l in lines])
-        grid = np.empty((ydim, xdim), dtype=np.object)
-        grid.fill(" ")
-        playerInitialPos = None
+        xdim = max(len(l) for l in lines)
+        cells = np.full((ydim, xdim), self.EMPTY, dtype=np.uint8)
         for y, line in enumerate(lines):
-            for x, char in enumerate(line):
-                grid[y, x] = char
-                if char == "P":
-                    playerInitialPos = (x, y)
-        self.grid = grid
-        self.padding = 100
-        paddedGrid = np.empty((ydim + 2 * self.padding, xdim + 2 * self.padding), dtype=np.object)
-        paddedGrid.fill(" ")
-        paddedGrid[self.padding:self.padding+ydim, self.padding:self.padding+xdim] = grid
-        self.paddedGrid = paddedGrid
+            try:
+                cells[y, :len(line)] = np.frombuffer(line.encode("ascii"), dtype=np.uint8)
+            except UnicodeEncodeError:
+                raise ValueError(f"Line {y+1} of grid file {path} contains non-ASCII characters")
+        playerCells = np.argwhere(cells == self.PLAYER)
+        playerInitialPos = None
+        if len(playerCells) > 0:
+            y, x = playerCells[-1]
+            playerInitialPos = (int(x), int(y))
+        self.cells = cells
         self.playerInitialGridPos = playerInitialPos
         self.cellDim = cellDim
         self.game = game
+        self._observationChannels: Dict[int, np.ndarray] = {}
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """
+        :return: the shape (ydim, xdim) of the grid
+        """
+        return self.cells.shape
 
     def cellRect(self, x, y) -> Rect:
         return Rect(x * self.cellDim, y * self.cellDim, self.cellDim, self.cellDim)
@@ -126,26 +232,104 @@ class Grid:
         """
         return (pos % self.cellDim) / self.cellDim
 
-    def iterGameObjects(self) -> Iterator[GameObject]:
-        for y in range(self.grid.shape[0]):
-            for x in range(self.grid.shape[1]):
-                c = self.grid[y, x]
-                if c == "P":
+    def iterPlatformCells(self) -> Iterator[Tuple[int, int]]:
+        """
+        :return: an iterator over the (x, y) coordinates of all platform cells (in row-major order)
+        """
+        for y, x in zip(*np.nonzero(self.cells == self.PLATFORM)):
+            yield int(x), int(y)
+
+    def mergedPlatformRects(self) -> List[Rect]:
+        """
+        Merges the platform cells into larger rectangles by greedily extending each run of horizontally adjacent cells
+        (which are not yet covered) downwards for as long as the cells below are platform cells as well
+
+        :return: a list of disjoint rectangles (in grid coordinates), which together cover exactly the platform cells
+        """
+        ydim, xdim = self.cells.shape
+        isPlatform = self.cells == self.PLATFORM
+        covered = np.zeros((ydim, xdim), dtype=bool)
+        rects = []
+        for x, y in self.iterPlatformCells():
+            if covered[y, x]:
+                continue
+            x1 = x + 1
+            while x1 < xdim and isPlatform[y, x1] and not covered[y, x1]:
+                x1 += 1
+            y1 = y + 1
+            while y1 < ydim and isPlatform[y1, x:x1].all() and not covered[y1, x:x1].any():
+                y1 += 1
+            covered[y:y1, x:x1] = True
+            rects.append(Rect(x, y, x1 - x, y1 - y))
+        return rects
+
+    def iterGameObjects(self, mergePlatforms=True) -> Iterator[GameObject]:
+        """
+        :param mergePlatforms: whether to merge adjacent platform cells into larger platforms (see mergedPlatformRects),
+            reducing the number of sprites; collisions are nonetheless computed on the basis of individual cells
+            (see GridLevel), such that the merge does not affect the game dynamics
+        :return: an iterator over the game objects defined by the grid
+        """
+        platformRects = {}
+        if mergePlatforms:
+            for r in self.mergedPlatformRects():
+                platformRects[r.topleft] = Rect(r.x * self.cellDim, r.y * self.cellDim, r.w * self.cellDim, r.h * self.cellDim)
+        for y in range(self.cells.shape[0]):
+            for x in range(self.cells.shape[1]):
+                c = self.cells[y, x]
+                if c == self.PLAYER:
                     continue
-                elif c == "X":
-                    yield Platform({"wrect": self.cellRect(x, y), "visible": True}, self.game)
-                elif c == "E":
+                elif c == self.PLATFORM:
+                    if not mergePlatforms:
+                        yield Platform({"wrect": self.cellRect(x, y), "visible": True}, self.game)
+                    elif (x, y) in platformRects:
+                        yield Platform({"wrect": platformRects[(x, y)], "visible": True}, self.game)
+                elif c == self.EXIT:
                     yield Exit({"wrect": self.cellRect(x, y)}, self.game, size=(self.cellDim, self.cellDim))
 
+    def iterCellsInRect(self, rect: Rect) -> Iterator[Tuple[int, int]]:
+        """
+        :param rect: a rectangle (in world coordinates) that is aligned with cell boundaries
+        :return: an iterator over the (x, y) coordinates of the cells making up the rectangle
+        """
+        x0, y0 = rect.left // self.cellDim, rect.top // self.cellDim
+        x1, y1 = rect.right // self.cellDim, rect.bottom // self.cellDim
+        for y in range(int(y0), int(y1)):
+            for x in range(int(x0), int(x1)):
+                yield x, y
+
     def surroundingGrid(self, cell: Tuple[int, int], xminus, xplus, yminus, yplus) -> np.ndarray:
+        """
+        :param cell: the (x, y) coordinates of the centre cell
+        :return: the array of characters of the cells surrounding the given cell, where cells outside of the grid
+            are empty (" ")
+        """
         x, y = cell
         xdim = 1 + xplus + xminus
         ydim = 1 + yplus + yminus
-        x0 = x - xminus + self.padding
-        y0 = y - yminus + self.padding
-        x1 = x0 + xdim
-        y1 = y0 + ydim
-        return self.paddedGrid[y0:y1, x0:x1]
+        x0 = x - xminus
+        y0 = y - yminus
+        result = np.full((ydim, xdim), self.EMPTY, dtype=np.uint8)
+        cx0, cy0 = max(x0, 0), max(y0, 0)
+        cx1, cy1 = min(x0 + xdim, self.cells.shape[1]), min(y0 + ydim, self.cells.shape[0])
+        if cx0 < cx1 and cy0 < cy1:
+            result[cy0-y0:cy1-y0, cx0-x0:cx1-x0] = self.cells[cy0:cy1, cx0:cx1]
+        return result.view("S1").astype(str)
+
+    def observationChannels(self, padding: int) -> np.ndarray:
+        """
+        :param padding: the number of empty cells with which to pad the grid on each side
+        :return: a uint8 tensor of shape (2, ydim + 2 * padding, xdim + 2 * padding) containing one-hot encodings of
+            platform cells (channel 0) and exit cells (channel 1); the tensor is created once per padding size
+        """
+        channels = self._observationChannels.get(padding)
+        if channels is None:
+            ydim, xdim = self.cells.shape
+            channels = np.zeros((2, ydim + 2 * padding, xdim + 2 * padding), dtype=np.uint8)
+            channels[0, padding:padding+ydim, padding:padding+xdim] = self.cells == self.PLATFORM
+            channels[1, padding:padding+ydim, padding:padding+xdim] = self.cells == self.EXIT
+            self._observationChannels[padding] = channels
+        return channels
 
     def playerInitialPos(self) :
         cellRect = self.cellRect(*self.playerInitialGridPos)
@@ -156,12 +340,33 @@ class GridLevel(Level):
     """
     Level from grid-based text file
     """
-    def __init__(self, path, game):
+    def __init__(self, path, game, mergePlatforms=True):
+        """
+        :param path: the path of the grid file
+        :param game: the game
+        :param mergePlatforms: whether to merge adjacent platform cells into larger platform sprites
+        """
         self.grid = Grid(path, game)
         super().__init__(self.grid.playerInitialPos())
-        for o in self.grid.iterGameObjects():
+        self.path = path
+        for o in self.grid.iterGameObjects(mergePlatforms=mergePlatforms):
             self.add(o)
 
+    def _createPlatformRects(self) -> PlatformRects:
+        # collisions are computed on the basis of individual cells (in row-major order) regardless of whether cells
+        # were merged into larger platforms, because the collision resolution depends on the individual rectangles
+        cellRects = []
+        cellPlatforms = []
+        for p in self.platforms.sprites():
+            for cell in self.grid.iterCellsInRect(p.wrect):
+                cellRects.append(self.grid.cellRect(*cell))
+                cellPlatforms.append(p)
+        order = sorted(range(len(cellRects)), key=lambda i: (cellRects[i].y, cellRects[i].x))
+        return PlatformRects([cellPlatforms[i] for i in order], [cellRects[i] for i in order])
+
+    def _createCollisionIndex(self) -> CollisionIndex:
+        return GridCellCollisionIndex(self.getPlatformRects(), self.grid.shape, int(self.grid.cellDim))
+
 
 def loadLevel(path: str, game) -> Level:
     if path[-2:] == ".p":
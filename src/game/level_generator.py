@@ -0,0 +1,124 @@
+import os
+from typing import List, Tuple
+
+import numpy as np
+
+from .level import Grid
+
+
+class GridLevelGenerator:
+    """
+    Procedurally generates grid-based levels (in the text format read by Grid) consisting of horizontal floors with
+    gaps, wall columns standing on the floors, a start position ("P") on the bottom floor and exits ("E").
+    The output is fully determined by the generator's parameters and the seed.
+    """
+    def __init__(self, width: int, height: int, platformDensity: float = 0.75, wallProbability: float = 0.04,
+            floorSpacing: int = 4, maxGapLength: int = 3, maxWallHeight: int = 3, numExits: int = 1):
+        """
+        :param width: the number of columns
+        :param height: the number of rows (at least floorSpacing + 1)
+        :param platformDensity: the (approximate) fraction of floor cells that are platform cells (the remaining
+            cells being gaps)
+        :param wallProbability: the probability with which a wall column is placed on a floor cell
+        :param floorSpacing: the vertical distance (in cells) between successive floors
+        :param maxGapLength: the maximum length of a gap in a floor
+        :param maxWallHeight: the maximum height of wall columns
+        :param numExits: the number of exits to place
+        """
+        if height < floorSpacing + 1:
+            raise ValueError(f"Height must be at least {floorSpacing + 1}")
+        if width < 8:
+            raise ValueError("Width must be at least 8")
+        if not 0 < platformDensity <= 1:
+            raise ValueError("Platform density must be in (0, 1]")
+        self.width = width
+        self.height = height
+        self.platformDensity = platformDensity
+        self.wallProbability = wallProbability
+        self.floorSpacing = floorSpacing
+        self.maxGapLength = maxGapLength
+        self.maxWallHeight = max(1, min(maxWallHeight, floorSpacing - 2))
+        self.numExits = numExits
+
+    def _generateFloor(self, cells: np.ndarray, y: int, rand: np.random.RandomState):
+        # alternate between platform segments and gaps, choosing the mean segment length such that the expected
+        # fraction of platform cells corresponds to the platform density
+        meanGapLength = (1 + self.maxGapLength) / 2
+        meanSegmentLength = max(1.0, meanGapLength * self.platformDensity / max(1 - self.platformDensity, 1e-6))
+        x = 0
+        while x < self.width:
+            segmentLength = 1 + rand.poisson(meanSegmentLength - 1)
+            cells[y, x:x+segmentLength] = Grid.PLATFORM
+            x += segmentLength
+            if self.platformDensity < 1:
+                x += rand.randint(1, self.maxGapLength + 1)
+
+    def generateCells(self, seed: int) -> np.ndarray:
+        """
+        :param seed: the random seed
+        :return: the array of cell codes (see Grid)
+        """
+        rand = np.random.RandomState(seed)
+        cells = np.full((self.height, self.width), Grid.EMPTY, dtype=np.uint8)
+
+        # floors (from the bottom row upwards)
+        floorRows = list(range(self.height - 1, 0, -self.floorSpacing))
+        for y in floorRows:
+            self._generateFloor(cells, y, rand)
+
+        # walls standing on floor cells
+        for y in floorRows:
+            for x in np.flatnonzero((cells[y] == Grid.PLATFORM) & (rand.rand(self.width) < self.wallProbability)):
+                wallHeight = rand.randint(1, self.maxWallHeight + 1)
+                cells[max(y - wallHeight, 0):y, x] = Grid.PLATFORM
+
+        # start position on a solid piece of the bottom floor at the left end, keeping the cells around it free
+        bottom = self.height - 1
+        cells[bottom, 0:4] = Grid.PLATFORM
+        cells[bottom - self.floorSpacing + 1:bottom, 0:4] = Grid.EMPTY
+        cells[bottom - 1, 1] = Grid.PLAYER
+
+        # exits on top of floor cells in the right half of the level
+        candidates = [(x, y - 1) for y in floorRows for x in range(self.width // 2, self.width)
+            if cells[y, x] == Grid.PLATFORM and cells[y - 1, x] == Grid.EMPTY]
+        if len(candidates) == 0:
+            candidates = [(self.width - 1, bottom - 1)]
+            cells[bottom, self.width - 1] = Grid.PLATFORM
+        for i in rand.choice(len(candidates), size=min(self.numExits, len(candidates)), replace=False):
+            x, y = candidates[i]
+            cells[y, x] = Grid.EXIT
+        return cells
+
+    def generateLines(self, seed: int) -> List[str]:
+        """
+        :param seed: the random seed
+        :return: the lines of the grid file
+        """
+        return [row.tobytes().decode("ascii").rstrip() for row in self.generateCells(seed)]
+
+    def write(self, path: str, seed: int):
+        """
+        Writes a generated level to the given grid file
+
+        :param path: the path of the grid file
+        :param seed: the random seed
+        """
+        dirname = os.path.dirname(path)
+        if dirname != "":
+            os.makedirs(dirname, exist_ok=True)
+        with open(path, "w") as f:
+            f.write("\n".join(self.generateLines(seed)) + "\n")
+
+
+def syntheticLevelShape(numTiles: int, minHeight: int = 9) -> Tuple[int, int]:
+    """
+    Determines the shape of a synthetic level with (approximately) the given number of tiles, which is much wider
+    than high (as is typical for platformer levels)
+
+    :param numTiles: the number of tiles
+    :param minHeight: the minimum number of rows
+    :return: the pair (width, height)
+    """
+    height = max(minHeight, int(np.sqrt(numTiles / 10)))
+    width = max(8, numTiles // height)
+    return width, height
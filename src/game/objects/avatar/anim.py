@@ -1,6 +1,8 @@
 import pygame
 import os
 
+from game.assets import getAssetCache
+
 
 class AnimBase(object):
     def scale(self, f):
@@ -9,9 +11,8 @@ class AnimBase(object):
 
 class AnimCycle(AnimBase):
     def __init__(self, path, *filenames):
-        self.images = []
-        for filename in filenames:
-            self.images.append(pygame.image.load(os.path.join(path, filename)).convert_alpha())
+        self.paths = [os.path.join(path, filename) for filename in filenames]
+        self.images = [getAssetCache().image(p) for p in self.paths]
         self.cycle = 0
         self.step = 0
     
@@ -26,12 +27,14 @@ class AnimCycle(AnimBase):
 class AnimCycleFlipped(AnimCycle):
     def __init__(self, animCycle):
         self.cycle = self.step = 0
-        self.images = [pygame.transform.flip(img, True, False) for img in animCycle.images]
+        self.paths = animCycle.paths
+        self.images = [getAssetCache().image(p, flipX=True) for p in self.paths]
 
 
 class AnimImage(AnimBase):
     def __init__(self, path, filename):
-        self.images = [pygame.image.load(os.path.join(path, filename)).convert_alpha()]
+        self.paths = [os.path.join(path, filename)]
+        self.images = [getAssetCache().image(self.paths[0])]
     
     def get(self):
         return self.images[0]
@@ -39,5 +42,6 @@ class AnimImage(AnimBase):
 
 class AnimImageFlipped(AnimImage):
     def __init__(self, animImage):
-        self.images = [pygame.transform.flip(animImage.get(), True, False)]
+        self.paths = animImage.paths
+        self.images = [getAssetCache().image(self.paths[0], flipX=True)]
 
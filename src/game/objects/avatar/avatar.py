@@ -1,9 +1,10 @@
-from typing import Tuple, TYPE_CHECKING
+from typing import Tuple, TYPE_CHECKING, Dict
 
-from collections import defaultdict
 from pygame.locals import *
 
+from game.assets import getAssetCache
 from game.objects import DynamicObject, GameObject
+from game.remote_control import RemoteAction
 from .motion import *
 from .anim import *
 
@@ -12,14 +13,41 @@ if TYPE_CHECKING:
 
 
 class Timeline(object):
+    """
+    The sequence of states of an avatar, which is stored as a persistent linked list, such that the timeline
+    can be saved (and restored) in constant time, regardless of its length
+    """
     def __init__(self):
-        self.history = defaultdict(list)
+        self.head = None  # the most recent entry (time, state, previousEntry)
     
     def addState(self, time, state):
-        self.history[time] = tuple(state)
+        self.head = (time, tuple(state), self.head)
+
+    @property
+    def history(self) -> Dict[int, tuple]:
+        """
+        :return: a mapping from time to the (most recently added) state for that time
+        """
+        entries = []
+        entry = self.head
+        while entry is not None:
+            entries.append(entry)
+            entry = entry[2]
+        return {time: state for time, state, _ in reversed(entries)}
+
+    def clear(self):
+        self.head = None
+
+    def saveState(self):
+        return self.head
+
+    def restoreState(self, state):
+        self.head = state
 
 
 class Avatar(DynamicObject):
+    size = (30, 30)
+
     def __init__(self, d, game):
         if type(d) != dict:
             rect = pygame.Rect(0,0,10,10) # dummy
@@ -31,22 +59,26 @@ class Avatar(DynamicObject):
             
         self.useAnimations = False
         self.anim = {}
-        animPath = os.path.join("assets", "anim")
-        self.anim["walkLeft"] = AnimCycle(animPath, "left1.png", "left2.png", "left3.png")
-        self.anim["walkRight"] = AnimCycleFlipped(self.anim["walkLeft"])
-        self.anim["leftWall"] = AnimImage(animPath, "leftwall.png")
-        self.anim["rightWall"] = AnimImageFlipped(self.anim["leftWall"])
-        self.anim["idle"] = AnimImage(animPath, "idle.png")
-        #for a in self.anim.values():
-        #    a.scale(0.6)
+        if game.enableRendering:
+            animPath = os.path.join("assets", "anim")
+            self.anim["walkLeft"] = AnimCycle(animPath, "left1.png", "left2.png", "left3.png")
+            self.anim["walkRight"] = AnimCycleFlipped(self.anim["walkLeft"])
+            self.anim["leftWall"] = AnimImage(animPath, "leftwall.png")
+            self.anim["rightWall"] = AnimImageFlipped(self.anim["leftWall"])
+            self.anim["idle"] = AnimImage(animPath, "idle.png")
+            #for a in self.anim.values():
+            #    a.scale(0.6)
         
-        surface = pygame.Surface((30,30))
-        surface.fill((0,50,100))
-        self.image = surface.convert_alpha()
-        #self.image = pygame.image.load(os.path.join("assets", "anim", "left1.png")).convert_alpha()        
-        self.rect = self.image.get_rect()
+            self.image = getAssetCache().solidImage(self.size, (0,50,100))
+            #self.image = pygame.image.load(os.path.join("assets", "anim", "left1.png")).convert_alpha()        
+            self.rect = self.image.get_rect()
+        else:
+            self.image = None
+            self.rect = pygame.Rect((0, 0), self.size)
         self.rect.center = self.pos
         self.initialpos = self.rect.center = self.pos
+        self.initialLocation = tuple(self.pos)  # unlike initialpos, unaffected by in-place modifications of pos
+        self.initialImage = self.image
         self.timeline = Timeline()
         self.state.pos = self.pos        
         
@@ -56,8 +88,17 @@ class Avatar(DynamicObject):
         self.pos = numpy.array(pos, dtype=numpy.float64)
         
     def reset(self):
-        self.pos = self.initialpos
+        """
+        Restores the avatar's initial state
+        """
+        self.setLocation(self.initialLocation)
+        if self.image is not self.initialImage:
+            self.image = self.initialImage
+            self.rect = self.image.get_rect()
         self.rect.center = self.pos
+        self.state.pos = self.pos
+        self.timeline.clear()
+        self.counter = 0
     
     def update(self, game):
         self.pos = self.state.pos
@@ -65,14 +106,43 @@ class Avatar(DynamicObject):
 
 
 class ControlledAvatar(Avatar):
+    DEATH_VEL = 250  # the downward velocity beyond which the avatar dies
+
     def __init__(self, d, game):
         super(ControlledAvatar, self).__init__(d, game)
         
         #self.motion = SillyOldMotion(self)
-        self.motion = MeatBoyMotion(self)  
+        self.motion = FastMeatBoyMotion(self) if game.fastMotion else MeatBoyMotion(self)
         
+        self.bindControls()
+
+    def bindControls(self):
+        """
+        Binds the avatar's controls to the key events
+        """
         self.bind(pygame.KEYDOWN, self.onKeyDown)
         self.bind(pygame.KEYUP, self.onKeyUp)
+
+    def reset(self):
+        super().reset()
+        self.motion.reset()
+
+    def saveState(self) -> tuple:
+        """
+        :return: the avatar's complete (dynamic) state, including the motion state and the timeline
+        """
+        return self.pos.copy(), tuple(self.rect), self.image, self.counter, self.timeline.saveState(), \
+            self.motion.saveState()
+
+    def restoreState(self, state: tuple):
+        """
+        :param state: a state previously returned by saveState
+        """
+        pos, rect, self.image, self.counter, timelineState, motionState = state
+        self.pos = self.state.pos = pos.copy()
+        self.rect = pygame.Rect(rect)
+        self.timeline.restoreState(timelineState)
+        self.motion.restoreState(motionState)
         
     def triggerMotion(self, event, status):
         if event.key in (K_w, K_UP, K_PERIOD):
@@ -91,22 +161,50 @@ class ControlledAvatar(Avatar):
             if len(self.collide(game.level.portals)) > 0:
                 game.travelBackInTime()
         if event.key in (K_w, K_UP, K_PERIOD):
-            if len(self.collide(game.level.exits)) > 0:
-                game.playerExitsLevel()
+            self._checkExit()
 
     def onKeyUp(self, event):
         self.triggerMotion(event, False)
+
+    def _checkExit(self):
+        game: Game = self.game
+        if len(self.collide(game.level.exits)) > 0:
+            game.playerExitsLevel()
+
+    def applyAction(self, action: RemoteAction):
+        """
+        Directly applies a remote action, bypassing the event queue (equivalent to the key events generated
+        for the action by RemoteActionEventGenerator)
+
+        :param action: the action
+        """
+        self.setControls(*action.getControls())
+
+    def setControls(self, left: bool, right: bool, jump: bool, run: bool = False):
+        """
+        Directly sets the state of the avatar's controls, bypassing the event queue
+
+        :param left: whether to move left
+        :param right: whether to move right
+        :param jump: whether to jump (a jump is triggered when the jump control becomes active, which also exits
+            the level if the avatar is at an exit)
+        :param run: whether to run
+        """
+        jumpPressed = jump and not self.motion.jump
+        self.motion.setControls(left, right, jump, run)
+        if jumpPressed:
+            self._checkExit()
         
     def update(self, game):
         # check for death
-        if self.motion.vel[1] > 250:
+        if self.motion.vel[1] > self.DEATH_VEL:
             game.playerDies()
             return
         
         # update position
         self.pos = self.state.pos = self.motion.update(game)
         
-        if self.useAnimations:
+        if self.useAnimations and self.game.enableRendering:
             if self.motion.onLeftWall:
                 self.image = self.anim["leftWall"].get()
             elif self.motion.onRightWall:
@@ -138,17 +236,17 @@ class ControlledAvatar(Avatar):
 class Ghost(GameObject):    
     def __init__(self, player):
         super().__init__(player.__dict__, player.game)
-        surface = pygame.Surface((30,30))
-        surface.fill((0,50,100))
-        surface.set_alpha(100)
-        self.image = surface.convert_alpha()
-        self.rect = self.image.get_rect()
+        if self.game.enableRendering:
+            self.image = getAssetCache().solidImage(Avatar.size, (0,50,100), surfaceAlpha=100)
+            self.rect = self.image.get_rect()
+        else:
+            self.image = None
+            self.rect = pygame.Rect((0, 0), Avatar.size)
         self.history = dict(player.timeline.history)
     
     def update(self, game):
         time = game.time
         if time in self.history:
             self.pos = self.history[time]
-        GameObject.update(self, game)
         
         
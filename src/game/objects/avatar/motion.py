@@ -1,7 +1,13 @@
+import logging
+import math
+import operator
+
 import numpy
-from game.debug import log
+from game.debug import getLogger
 import pygame
 
+log = getLogger(__name__)
+
 class SillyOldMotion(object):
     def __init__(self, avatar):
         self.avatar = avatar
@@ -45,7 +51,7 @@ class SillyOldMotion(object):
             self.acc[0] = self.groundAcc if self.onGround else self.airAcc
             if self.left: self.acc[0] *= -1
         if self.jump:
-            log("jump")
+            log.debug("jump")
             if self.onGround is True or self.onWall is True:
                 self.vel[1] = -100
                 self.onGround, self.onWall = False, False
@@ -91,32 +97,61 @@ class SillyOldMotion(object):
 
 
 class MeatBoyMotion(object):
+    # motion parameters (shared by all motion engines, including game.batch.BatchSimulation)
+    velScale = 0.1
+    accScale = 0.35
+
+    grav = 12.0
+
+    maxHorVel = 50.0
+    maxHorRunVel = 90.0
+    groundAcc = 40
+    airHorAcc = 20.0 # horizontal acceleration while in air
+
+    jumpSpeed = 100
+    jumpAcc = jumpSpeed / 2.5
+
+    groundFrictionCoeff = 0.5
+    wallFriction = 7
+
     def __init__(self, avatar):
-        self.debug = False
         self.avatar = avatar        
         
-        self.velScale = 0.1
-        self.accScale = 0.35
-        
-        self.grav = 12.0
-        
-        self.maxHorVel = 50.0
-        self.maxHorRunVel = 90.0
-        self.groundAcc = 40
-        self.airHorAcc = 20.0 # horizontal acceleration while in air
-        
-        self.jumpSpeed = 100
-        self.jumpAcc = self.jumpSpeed / 2.5
-        
-        self.groundFrictionCoeff = 0.5
-        self.wallFriction = 7
+        self.accGrav = numpy.array([0.0, self.grav])
+        self.reset()
 
+    def reset(self):
+        """
+        Restores the initial motion state (at rest, with no controls active)
+        """
         self.left = self.right = self.jump = self.startJump = self.running = False
         self.onGround = self.onWall = self.onLeftWall = self.onRightWall = False
         self.vel = numpy.array([0.0, 0.0])
         self.acc = numpy.array([0.0, 0.0])
-        self.accGrav = numpy.array([0.0, self.grav])
         self.accFriction = numpy.array([0.0, 0.0])
+
+    _getFlags = operator.attrgetter("left", "right", "jump", "startJump", "running", "onGround", "onWall",
+        "onLeftWall", "onRightWall")
+
+    def _setFlags(self, flags):
+        self.left, self.right, self.jump, self.startJump, self.running, self.onGround, self.onWall, \
+            self.onLeftWall, self.onRightWall = flags
+
+    def saveState(self) -> tuple:
+        """
+        :return: the motion state (control and contact flags, velocity and accelerations)
+        """
+        return self._getFlags(self), self.vel.copy(), self.acc.copy(), self.accFriction.copy()
+
+    def restoreState(self, state: tuple):
+        """
+        :param state: a state previously returned by saveState
+        """
+        flags, vel, acc, accFriction = state
+        self._setFlags(flags)
+        self.vel = vel.copy()
+        self.acc = acc.copy()
+        self.accFriction = accFriction.copy()
     
     def offset(self, x, y):
         self.pos += numpy.array([x,y])
@@ -132,8 +167,7 @@ class MeatBoyMotion(object):
         return self.accScale * (self.acc + self.accGrav + self.accFriction)
     
     def update(self, game):
-        debug = self.debug
-        log.push(debug)
+        debug = log.isEnabledFor(logging.DEBUG)
         
         self.pos = self.avatar.pos.copy()
         self.rect = self.avatar.rect.copy()
@@ -148,18 +182,15 @@ class MeatBoyMotion(object):
         self.pos += offset
         self.rect.center = self.discretise(self.pos)
         
-        log("after velocity update, pos =", str(self.rect.midbottom), self.pos, offset)
+        if debug:
+            log.debug("after velocity update, pos =", self.rect.midbottom, self.pos, offset)
 
         # process platform interaction, determining onGround
         self.processPlatformInteraction()
-        log("after platform interaction, pos =", str(self.rect.midbottom))
-
-        if debug:
-            log("onGround: %s, onWall: %s, left: %s, right: %s, pos: %s" % (self.onGround, self.onWall, self.left, self.right, self.rect.midbottom))
-        
-        log.push(debug, indent=2)
         if debug:
-            log("vel: %s, acc: %s" % (self.vel, self.acc))
+            log.debug("after platform interaction, pos =", self.rect.midbottom)
+            log.debug("onGround:", self.onGround, "onWall:", self.onWall, "left:", self.left, "right:", self.right, "pos:", self.rect.midbottom)
+            log.debug("  vel:", self.vel, "acc:", self.acc)
         
         # update velocity and acceleration based on move actions
        
@@ -180,7 +211,7 @@ class MeatBoyMotion(object):
             self.vel[1] = 0
             
             if self.startJump:
-                log("jump")
+                log.debug("  jump")
                 self.acc[1] = -self.jumpAcc
                 self.onGround = False
                 
@@ -212,7 +243,7 @@ class MeatBoyMotion(object):
                 self.acc[0] = self.oriented(self.airHorAcc)
 
         if debug:
-            log("vel: %s, acc: %s" % (self.vel, self.acc))
+            log.debug("  vel:", self.vel, "acc:", self.acc)
         
         if abs(self.vel[0]) > maxHorVel:
             self.vel[0] = maxHorVel * numpy.sign(self.vel[0])
@@ -222,8 +253,6 @@ class MeatBoyMotion(object):
             self.acc[1] = 0.0
         
         self.startJump = False
-
-        log.pop(2)
         
         return self.discretise(self.pos)
 
@@ -231,19 +260,22 @@ class MeatBoyMotion(object):
         return x if self.right else -x
             
     def processPlatformInteraction(self):
-        log.push(self.debug)
+        debug = log.isEnabledFor(logging.DEBUG)
         
         game = self.avatar.game
+        collisionIndex = game.level.getCollisionIndex()
+        platforms = collisionIndex.platformRects.platforms
+        platformRects = collisionIndex.platformRects.rects
         self.onGround = False
         
-        for p in filter(lambda p: self.rect.colliderect(p.wrect), game.level.platforms):
+        for i in collisionIndex.iterColliding(self.rect):
+            p = platforms[i]
             if p.visible:
-                
-                if p.wrect.contains(self.rect): # platform contains avatar completely                    
+                platformRect = platformRects[i]
+
+                if platformRect.contains(self.rect): # platform contains avatar completely                    
                     continue
                 
-                platformRect = p.wrect
-                
                 horMovement = abs(self.vel[0]) > abs(self.vel[1])
                 vertMovement = not horMovement
                 
@@ -258,56 +290,53 @@ class MeatBoyMotion(object):
                 if self.vel[0] > 0: rightShift = 0
                 elif self.vel[0] < 0: leftShift = 0
                 
-                log("collide", downShift, leftShift, rightShift, upShift, "with vel", self.vel)
+                if debug:
+                    log.debug("collide", downShift, leftShift, rightShift, upShift, "with vel", self.vel)
                 
                 vertShift = upShift + downShift > 0
                 horShift = leftShift + rightShift > 0
                 
                 minShift = min(filter(lambda x: x > 0, [leftShift, rightShift, upShift, downShift])) if vertShift or horShift else 1000
                 
-                log.push(indent=2)
                 if downShift == minShift: #downShift > 0 and (vertMovement or not horShift):
-                    log("shifting down")
+                    if debug:
+                        log.debug("  shifting down")
                     self.offset(0, downShift)                    
                     self.vel[1] = self.acc[1] = 0                    
                 elif leftShift == minShift: #leftShift > 0 and (horMovement or not vertShift):
-                    log("shifting left")
+                    if debug:
+                        log.debug("  shifting left")
                     self.offset(-leftShift, 0)                    
                     #self.vel[1] = 0
                     self.vel[0] = self.acc[0] = 0
                 elif rightShift == minShift: #rightShift > 0 and (horMovement or not vertShift):
-                    log("shifting right")
+                    if debug:
+                        log.debug("  shifting right")
                     self.offset(rightShift, 0)                    
                     #self.vel[1] = 0
                     self.vel[0] = self.acc[0] = 0
                 elif upShift == minShift: #upShift > 0 and (vertMovement or not horShift):
-                    log("shifting up")
+                    if debug:
+                        log.debug("  shifting up")
                     self.offset(0, -upShift)                    
                     self.vel[1] = self.acc[1] = 0
                 else:
-                    log("not shifting")
-                log.pop()
+                    if debug:
+                        log.debug("  not shifting")
                 
         # determine if there are supporting platforms
-        r = self.rect.move(0, 1)
-        supportingPlatforms = list(filter(lambda p: r.colliderect(p.wrect), game.level.platforms))
-        if len(supportingPlatforms) > 0:
+        r = self.rect
+        if collisionIndex.anyColliding(r.left, r.top + 1, r.right, r.bottom + 1):
             self.onGround = True
-            #log("  on supporting plane with top = %s" % supportingPlatforms[0].wrect.top)
         
         # determine wall clinging
         self.onLeftWall = self.onRightWall = False
         if not self.onGround:
-            r = self.rect.move(-1, 0)
-            if len(list(filter(lambda p: r.colliderect(p.wrect), game.level.platforms))) > 0:
+            if collisionIndex.anyColliding(r.left - 1, r.top, r.right - 1, r.bottom):
                 self.onLeftWall = True
-            else:
-                r = self.rect.move(1, 0)
-                if len(list(filter(lambda p: r.colliderect(p.wrect), game.level.platforms))) > 0:
-                    self.onRightWall = True
+            elif collisionIndex.anyColliding(r.left + 1, r.top, r.right + 1, r.bottom):
+                self.onRightWall = True
         self.onWall = self.onRightWall or self.onLeftWall
-        
-        log.pop()
 
     def moveLeft(self, status):
         self.left = status
@@ -322,3 +351,229 @@ class MeatBoyMotion(object):
     
     def run(self, status):
         self.running = status
+
+    def setControls(self, left: bool, right: bool, jump: bool, run: bool):
+        """
+        Sets the state of all controls at once (equivalent to calling the individual control methods whenever the
+        respective state changes, as is done for key events)
+        """
+        self.left = left
+        self.right = right
+        if jump and not self.jump:
+            self.startJump = True
+        self.jump = jump
+        self.running = run
+
+
+class FastMeatBoyMotion(MeatBoyMotion):
+    """
+    A faster implementation of MeatBoyMotion, which produces bit-identical trajectories.
+    The motion state is held in plain floats (rather than small numpy arrays), and collisions are tested directly
+    against the level's platform rectangles (see Level.getPlatformRects), as found via the level's collision index.
+    """
+    def __init__(self, avatar):
+        self.vx = self.vy = 0.0
+        self.ax = self.ay = 0.0
+        self.fx = self.fy = 0.0
+        self.left_ = self.top_ = self.right_ = self.bottom_ = 0  # the avatar's (world-space) rectangle
+        self._rect = pygame.Rect(0, 0, 0, 0)  # used to convert non-integer centre positions in the same way as pygame
+        super().__init__(avatar)
+
+    @property
+    def vel(self) -> numpy.ndarray:
+        return numpy.array([self.vx, self.vy])
+
+    @vel.setter
+    def vel(self, vel):
+        self.vx, self.vy = float(vel[0]), float(vel[1])
+
+    @property
+    def acc(self) -> numpy.ndarray:
+        return numpy.array([self.ax, self.ay])
+
+    @acc.setter
+    def acc(self, acc):
+        self.ax, self.ay = float(acc[0]), float(acc[1])
+
+    @property
+    def accFriction(self) -> numpy.ndarray:
+        return numpy.array([self.fx, self.fy])
+
+    @accFriction.setter
+    def accFriction(self, accFriction):
+        self.fx, self.fy = float(accFriction[0]), float(accFriction[1])
+
+    @property
+    def rect(self) -> pygame.Rect:
+        return pygame.Rect(self.left_, self.top_, self.right_ - self.left_, self.bottom_ - self.top_)
+
+    def saveState(self) -> tuple:
+        return self._getFlags(self), self.vx, self.vy, self.ax, self.ay, self.fx, self.fy
+
+    def restoreState(self, state: tuple):
+        flags, self.vx, self.vy, self.ax, self.ay, self.fx, self.fy = state
+        self._setFlags(flags)
+
+    @staticmethod
+    def _round(x: float) -> float:
+        # equivalent to numpy.round, which retains the sign of zero results
+        return math.copysign(round(x), x)
+
+    def _placeRect(self, cx, cy):
+        self._rect.center = (cx, cy)
+        self.left_, self.top_, self.right_, self.bottom_ = self._rect.left, self._rect.top, self._rect.right, self._rect.bottom
+
+    def _offset(self, x, y):
+        self.px += x
+        self.py += y
+        self._placeRect(self.px, self.py)
+
+    def velocityVector(self):
+        return numpy.array([self.vx * self.velScale, self.vy * self.velScale])
+
+    def accelerationVector(self):
+        return numpy.array([self.accScale * ((self.ax + 0.0) + self.fx), self.accScale * ((self.ay + self.grav) + self.fy)])
+
+    def update(self, game):
+        pos = self.avatar.pos
+        self.px, self.py = float(pos[0]), float(pos[1])
+        self._rect.size = self.avatar.rect.size
+        accScale = self.accScale
+
+        # update velocity
+        self.vx += accScale * ((self.ax + 0.0) + self.fx)
+        self.vy += accScale * ((self.ay + self.grav) + self.fy)
+
+        # update position
+        self.px += self.velScale * self.vx
+        self.py += self.velScale * self.vy
+        self._placeRect(round(self.px), round(self.py))
+
+        # process platform interaction, determining onGround
+        self.processPlatformInteraction()
+
+        # update velocity and acceleration based on move actions
+
+        if not self.jump:
+            self.ay = 0.0
+
+        maxHorVel = self.maxHorVel if not self.running else self.maxHorRunVel
+
+        if self.onGround:
+            self.fx = -self.vx * self.groundFrictionCoeff
+            self.fy = 0.0
+
+            if self.left or self.right:
+                self.ax = float(self.oriented(self.groundAcc))
+            else:
+                self.ax = 0.0
+            self.vy = 0.0
+
+            if self.startJump:
+                self.ay = -self.jumpAcc
+                self.onGround = False
+
+        elif self.onWall:
+            self.ax = 0.0
+
+            self.fx = 0.0
+            vy = self.vy
+            self.fy = -(1.0 if vy > 0 else (-1.0 if vy < 0 else 0.0)) * self.wallFriction
+
+            if self.startJump:
+                self.ay = 0.0
+                self.vx = float(maxHorVel if self.onLeftWall else -maxHorVel)
+                self.vy = float(-self.jumpSpeed)
+
+        else:  # in air (jumping)
+            self.fx = self.fy = 0.0
+            if not (self.left or self.right):
+                self.ax = 0.0
+            else:
+                self.ax = float(self.oriented(self.airHorAcc))
+
+        if abs(self.vx) > maxHorVel:
+            self.vx = maxHorVel * (1.0 if self.vx > 0 else -1.0)
+
+        if self.vy < -self.jumpSpeed:
+            self.vy = float(-self.jumpSpeed)
+            self.ay = 0.0
+
+        self.startJump = False
+
+        return numpy.array([self._round(self.px), self._round(self.py)])
+
+    def processPlatformInteraction(self):
+        collisionIndex = self.avatar.game.level.getCollisionIndex()
+        rectTuples = collisionIndex.platformRects.rectTuples
+        self.onGround = False
+
+        candidates = collisionIndex.colliding(self.left_, self.top_, self.right_, self.bottom_, visibleOnly=True)
+        k = 0
+        while k < len(candidates):
+            i = candidates[k]
+            k += 1
+            pLeft, pTop, pRight, pBottom = rectTuples[i]
+            left, top, right, bottom = self.left_, self.top_, self.right_, self.bottom_
+
+            if pLeft <= left and pTop <= top and pRight >= right and pBottom >= bottom:  # platform contains avatar completely
+                continue
+
+            downShift = pBottom - top if bottom > pBottom > top else 0
+            upShift = bottom - pTop if bottom > pTop > top else 0
+            leftShift = right - pLeft if right > pLeft > left else 0
+            rightShift = pRight - left if left < pRight < right else 0
+
+            # never shift in movement direction
+            if self.vy > 0: downShift = 0
+            elif self.vy < 0: upShift = 0
+            if self.vx > 0: rightShift = 0
+            elif self.vx < 0: leftShift = 0
+
+            shifts = [s for s in (leftShift, rightShift, upShift, downShift) if s > 0]
+            if not shifts:
+                continue
+            minShift = min(shifts)
+
+            if downShift == minShift:
+                self._offset(0, downShift)
+                self.vy = self.ay = 0.0
+            elif leftShift == minShift:
+                self._offset(-leftShift, 0)
+                self.vx = self.ax = 0.0
+            elif rightShift == minShift:
+                self._offset(rightShift, 0)
+                self.vx = self.ax = 0.0
+            else:
+                self._offset(0, -upShift)
+                self.vy = self.ay = 0.0
+
+            # the avatar was moved, so the collision candidates among the remaining platforms must be redetermined
+            candidates = collisionIndex.colliding(self.left_, self.top_, self.right_, self.bottom_, start=i + 1, visibleOnly=True)
+            k = 0
+
+        left, top, right, bottom = self.left_, self.top_, self.right_, self.bottom_
+
+        # determine the platforms adjacent to the avatar (which may be supporting platforms or walls) with a single
+        # query, testing the individual contact conditions on this small set only
+        adjacentRects = [rectTuples[i] for i in collisionIndex.colliding(left - 1, top, right + 1, bottom + 1)]
+
+        # determine if there are supporting platforms
+        for pLeft, pTop, pRight, pBottom in adjacentRects:
+            if pLeft < right and pRight > left and pTop < bottom + 1 and pBottom > top + 1:
+                self.onGround = True
+                break
+
+        # determine wall clinging
+        self.onLeftWall = self.onRightWall = False
+        if not self.onGround:
+            for pLeft, pTop, pRight, pBottom in adjacentRects:
+                if pLeft < right - 1 and pRight > left - 1 and pTop < bottom and pBottom > top:
+                    self.onLeftWall = True
+                    break
+            else:
+                for pLeft, pTop, pRight, pBottom in adjacentRects:
+                    if pLeft < right + 1 and pRight > left + 1 and pTop < bottom and pBottom > top:
+                        self.onRightWall = True
+                        break
+        self.onWall = self.onRightWall or self.onLeftWall
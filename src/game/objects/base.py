@@ -1,10 +1,12 @@
-from pygame import sprite
+from pygame import sprite, Rect
 from game.events import EventHandler
 import numpy
 
 
 class GameObject(sprite.Sprite, EventHandler):
     ''' basic game object '''
+
+    isStatic = False  # whether the object never changes its state on its own (such that it need not be updated per frame)
     
     def __init__(self, d, game, *groups):
         if not hasattr(self, "peristentMembers"):
@@ -22,11 +24,32 @@ class GameObject(sprite.Sprite, EventHandler):
         self.pos = self.rect.center = numpy.array(self.wrect.center)        
         
     def update(self, game):
-        # update the sprite's drawing position relative to the camera
+        """
+        Advances the object's state by one frame (not called for static objects)
+        """
+        pass
+
+    def updateScreenRect(self, game):
+        """
+        Updates the sprite's drawing position relative to the camera (only required for rendering)
+        """
         self.rect.center = self.pos - game.camera.pos
+
+    def worldRect(self) -> Rect:
+        """
+        :return: the object's rectangle in world coordinates
+        """
+        rect = Rect((0, 0), self.rect.size)
+        rect.center = self.pos
+        return rect
     
-    def collide(self, group, doKill=False, collided=None):
-        return sprite.spritecollide(self, group, doKill, collided)
+    def collide(self, group):
+        """
+        :param group: a group of game objects
+        :return: the list of objects in the group whose world rectangles collide with this object's world rectangle
+        """
+        rect = self.worldRect()
+        return [o for o in group if rect.colliderect(o.worldRect())]
 
     def kill(self):
         self.unbindAll()
@@ -1,23 +1,18 @@
 from typing import Optional, Tuple
 
 import os
-import pygame
+from game.assets import getAssetCache
 from game.objects import GameObject
 
 
 class Exit(GameObject):
-    image = None
-    
+    isStatic = True
     def __init__(self, d, game, size: Optional[Tuple[float, float]] = None):
-        if not Exit.image:
-            imgpath = os.path.join("assets", "images", "exit.png")
-            img = pygame.image.load(imgpath).convert_alpha()
-            if size is not None:
-                img = pygame.transform.scale(img, size)
-            Exit.image = img
-
-        self.image = Exit.image
-        self.rect = self.image.get_rect()
+        if game.enableRendering:
+            self.image = getAssetCache().image(os.path.join("assets", "images", "exit.png"), size=size)
+            self.rect = self.image.get_rect()
+        else:
+            self.image = None
 
         if type(d) != dict: # old construction
             GameObject.__init__(self, {"wrect": d.rect}, game)
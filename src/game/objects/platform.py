@@ -1,9 +1,13 @@
 import pygame
 
+from game.assets import getAssetCache
 from game.objects import GameObject
 
 
 class Platform(GameObject):
+    isStatic = True
+    level = None  # the level the platform was added to (set by the level)
+
     def __init__(self, d, game):
         if type(d) != dict: # old construction
             GameObject.__init__(self, {"wrect": d.rect}, game)
@@ -19,8 +23,19 @@ class Platform(GameObject):
             self.default = self.visible = True
             self.group = None
             
+    @property
+    def visible(self):
+        return self._visible
+
+    @visible.setter
+    def visible(self, visible):
+        changed = visible != getattr(self, "_visible", visible)
+        self._visible = visible
+        if changed and self.level is not None:
+            self.level.onPlatformVisibilityChanged(self)
+
     def setSize(self, width, height):
-        self.image = pygame.Surface((width, height)).convert()
+        self.image = getAssetCache().solidImage((width, height), alpha=False) if self.game.enableRendering else None
         self.rect.width = width
         self.rect.height = height
     
@@ -31,4 +46,4 @@ class Platform(GameObject):
         self.visible = self.default
 
     def reset(self):
-        pass
+        self.visible = self.default
@@ -1,27 +1,28 @@
+from game.assets import getAssetCache
 from game.objects import GameObject
 import pygame
 import os
 import numpy
 
 class Portal(GameObject):
-    images = {}
+    imageSize = (100, 57)  # dimensions of the portal images, which determine the rect in headless mode
     
     def __init__(self, d, game):        
         
-        if not Portal.images:
-            inactiveImgPath = os.path.join("assets", "images", "portalInactive.png")
-            activeImgPath = os.path.join("assets", "images", "portalActive.png")
-            Portal.images['inactive'] = pygame.image.load(inactiveImgPath).convert_alpha()
-            Portal.images['active'] = pygame.image.load(activeImgPath).convert_alpha()
-        
-        self.image = Portal.images['inactive']
+        self.images = {}
+        if game.enableRendering:
+            self.images['inactive'] = getAssetCache().image(os.path.join("assets", "images", "portalInactive.png"))
+            self.images['active'] = getAssetCache().image(os.path.join("assets", "images", "portalActive.png"))
+            self.image = self.images['inactive']
+        else:
+            self.image = None
         
         self.activated = False
         
         if type(d) != dict: # old construction
             GameObject.__init__(self, {"wrect": d.rect}, game)
             self.group = d.sets
-            self.rect = self.image.get_rect()            
+            self.rect = self.image.get_rect() if self.image is not None else pygame.Rect((0, 0), Portal.imageSize)
             self.pos = numpy.array(d.rect.midbottom)
             self.pos[1] -= self.rect.height / 2
             self.rect.center = self.pos
@@ -33,16 +34,16 @@ class Portal(GameObject):
             self.activate()
         else:
             self.deactivate()
-            
-        GameObject.update(self, game)
         
     def activate(self):
         self.activated = True
-        self.image = Portal.images['active']
+        if self.game.enableRendering:
+            self.image = self.images['active']
 
     def deactivate(self):
         self.activated = False
-        self.image = Portal.images['inactive']
+        if self.game.enableRendering:
+            self.image = self.images['inactive']
     
     def reset(self):
-        pass
+        self.deactivate()
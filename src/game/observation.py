@@ -0,0 +1,270 @@
+from typing import TYPE_CHECKING, Tuple
+
+import numpy as np
+from pygame import Rect
+
+if TYPE_CHECKING:
+    from .level import Level
+    from .objects import Platform
+
+
+class LevelRaster:
+    """
+    A downsampled rasterisation of a level's static objects, where each raster cell covers scale x scale world pixels
+    and is set in a channel if any object of the channel's type overlaps it. The raster is kept up to date with
+    respect to the visibility of platforms (see Level.onPlatformVisibilityChanged).
+    """
+    CHANNEL_PLATFORMS = 0
+    CHANNEL_EXITS = 1
+    NUM_CHANNELS = 2
+
+    def __init__(self, level: "Level", scale: int):
+        """
+        :param level: the level
+        :param scale: the side length (in world pixels) of a raster cell
+        """
+        self.level = level
+        self.scale = scale
+        rects = [o.worldRect() for o in level.sprites() if o.isStatic]
+        if len(rects) == 0:
+            rects = [Rect(0, 0, scale, scale)]
+        left, top = min(r.left for r in rects), min(r.top for r in rects)
+        right, bottom = max(r.right for r in rects), max(r.bottom for r in rects)
+        self.origin = ((left // scale) * scale, (top // scale) * scale)  # the world coordinates of raster cell (0, 0)
+        x1, y1 = self.rasterBounds(right - 1, bottom - 1)[2:]
+        self.channels = np.zeros((self.NUM_CHANNELS, y1, x1), dtype=np.uint8)
+        for p in level.platforms:
+            if p.visible:
+                self._fill(self.CHANNEL_PLATFORMS, p.worldRect(), 1)
+        for e in level.exits:
+            self._fill(self.CHANNEL_EXITS, e.worldRect(), 1)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """
+        :return: the shape (ydim, xdim) of the raster
+        """
+        return self.channels.shape[1:]
+
+    def rasterBounds(self, left, top, right=None, bottom=None) -> Tuple[int, int, int, int]:
+        """
+        :return: the (unclipped) raster cell bounds (x0, y0, x1, y1) of the given world-space rectangle, where cells
+            x0 <= x < x1 and y0 <= y < y1 overlap the rectangle; if right and bottom are omitted, the bounds of the
+            cell containing the point (left, top)
+        """
+        s = self.scale
+        ox, oy = self.origin
+        x0, y0 = int((left - ox) // s), int((top - oy) // s)
+        if right is None:
+            return x0, y0, x0 + 1, y0 + 1
+        return x0, y0, -int((ox - right) // s), -int((oy - bottom) // s)
+
+    def _fill(self, channel: int, rect: Rect, value: int):
+        x0, y0, x1, y1 = self.rasterBounds(rect.left, rect.top, rect.right, rect.bottom)
+        self.channels[channel, max(y0, 0):max(y1, 0), max(x0, 0):max(x1, 0)] = value
+
+    def onPlatformVisibilityChanged(self, platform: "Platform"):
+        rect = platform.worldRect()
+        if platform.visible:
+            self._fill(self.CHANNEL_PLATFORMS, rect, 1)
+            return
+
+        # clear the cells covered by the platform and redraw the visible platforms overlapping these cells
+        x0, y0, x1, y1 = self.rasterBounds(rect.left, rect.top, rect.right, rect.bottom)
+        self.channels[self.CHANNEL_PLATFORMS, max(y0, 0):max(y1, 0), max(x0, 0):max(x1, 0)] = 0
+        s = self.scale
+        ox, oy = self.origin
+        platformRects = self.level.getPlatformRects()
+        for i in self.level.getCollisionIndex().colliding(ox + x0 * s, oy + y0 * s, ox + x1 * s, oy + y1 * s,
+                visibleOnly=True):
+            self._fill(self.CHANNEL_PLATFORMS, platformRects.rects[i], 1)
+
+
+class FeatureObservationBuilder:
+    """
+    Builds the feature vector observation of the avatar's situation in a grid level, which consists of one-hot
+    encodings of the platforms and exits in the grid cells surrounding the avatar, the direction of the exit, the
+    avatar's offset within its cell, its motion vectors and its motion flags (all values being in [-1, 1]).
+    The computation requires only NumPy, such that it can be shared by training environments and lightweight policy
+    runtimes.
+    """
+    MOTION_SCALE = 26
+
+    def __init__(self, gridContext: int = 5):
+        """
+        :param gridContext: the number of grid cells around the avatar's cell (in each direction) to include
+        """
+        self.gridContext = gridContext
+        contextDim = 2 * gridContext + 1
+        gridContextSize = contextDim * contextDim
+        size = 2 * gridContextSize
+        size += 2  # exit direction
+        size += 2  # avatar position offset in cell
+        size += 2 * 2  # avatar acceleration and velocity vectors
+        size += 3  # avatar motion flags
+        self.size = size
+        self._obs = np.zeros(size)
+        self._obsGrid = self._obs[:2 * gridContextSize].reshape((2, contextDim, contextDim))
+
+    def build(self, game) -> np.ndarray:
+        """
+        :param game: the game, whose current level must be a grid level
+        :return: the observation for the current state of the game; note that the array is reused (overwritten) by
+            subsequent calls
+        """
+        av = game.avatar
+        level = game.level
+        grid = getattr(level, "grid", None)
+        if grid is None:
+            raise ValueError(f"Only grid levels are supported, got {type(level)}")
+        exit = level.exits.sprites()[0]
+        obs = self._obs
+
+        # grid context (one-hot encodings of platforms and exits in the cells surrounding the avatar)
+        c = self.gridContext
+        channels = grid.observationChannels(c)
+        x, y = grid.gridCellForPos(av.pos)  # in the padded grid, the context starts at the avatar's cell
+        contextDim = 2 * c + 1
+        if 0 <= y and y + contextDim <= channels.shape[1] and 0 <= x and x + contextDim <= channels.shape[2]:
+            self._obsGrid[:] = channels[:, y:y+contextDim, x:x+contextDim]
+        else:  # partly or fully outside of the padded grid
+            self._obsGrid.fill(0)
+            y0, y1 = max(y, 0), min(y + contextDim, channels.shape[1])
+            x0, x1 = max(x, 0), min(x + contextDim, channels.shape[2])
+            if y0 < y1 and x0 < x1:
+                self._obsGrid[:, y0-y:y1-y, x0-x:x1-x] = channels[:, y0:y1, x0:x1]
+
+        i = self._obsGrid.size
+        exitVector = exit.pos - av.pos
+        exitVectorNorm = np.linalg.norm(exitVector)
+        if exitVectorNorm == 0:
+            obs[i:i+2] = 0
+        else:
+            obs[i:i+2] = exitVector / exitVectorNorm
+        obs[i+2:i+4] = grid.offsetInCell(av.pos)
+        motionScale = self.MOTION_SCALE
+        obs[i+4:i+6] = av.motion.velocityVector() / motionScale
+        obs[i+6:i+8] = av.motion.accelerationVector() / motionScale
+        obs[i+8] = av.motion.onLeftWall
+        obs[i+9] = av.motion.onRightWall
+        obs[i+10] = av.motion.onGround
+        return obs
+
+
+class PixelObservationRenderer:
+    """
+    Renders downsampled, avatar-centred images of the game state for pixel-based agents. The images are computed
+    off-screen (i.e. without a display and independently of whether the game renders) from the level's raster (see
+    LevelRaster) and the rectangles of the dynamic objects, writing to preallocated buffers.
+
+    The observation is a uint8 tensor of shape (numFrames * C, height, width) containing the most recent numFrames
+    frames (oldest first), where C = 1 for grayscale frames, in which objects are represented by different
+    intensities, and C = NUM_CHANNELS otherwise, with one binary (0/255) channel per object type.
+    """
+    CHANNEL_PLATFORMS = LevelRaster.CHANNEL_PLATFORMS
+    CHANNEL_EXITS = LevelRaster.CHANNEL_EXITS
+    CHANNEL_AVATAR = 2
+    CHANNEL_OTHERS = 3  # other dynamic objects (ghosts, portals)
+    NUM_CHANNELS = 4
+    GRAYSCALE_INTENSITIES = (255, 160, 210, 100)  # the intensity for each of the channels in grayscale frames
+
+    def __init__(self, width: int = 84, height: int = 84, scale: int = 8, grayscale: bool = True, numFrames: int = 4):
+        """
+        :param width: the width of the frames in pixels
+        :param height: the height of the frames in pixels
+        :param scale: the side length (in world pixels) of the area represented by a frame pixel
+        :param grayscale: whether to render grayscale frames (rather than frames with one channel per object type)
+        :param numFrames: the number of frames to stack
+        """
+        if numFrames < 1:
+            raise ValueError("numFrames must be at least 1")
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.grayscale = grayscale
+        self.numFrames = numFrames
+        self.numFrameChannels = 1 if grayscale else self.NUM_CHANNELS
+        self._obs = np.zeros((numFrames * self.numFrameChannels, height, width), dtype=np.uint8)
+        self._frames = self._obs.reshape((numFrames, self.numFrameChannels, height, width))
+        self._staticFrame = np.zeros((LevelRaster.NUM_CHANNELS, height, width), dtype=np.uint8)
+        self._staticCodes = np.zeros((height, width), dtype=np.uint8)
+        # grayscale intensities of static cells, indexed by platform + 2 * exit (exits being drawn over platforms)
+        i = self.GRAYSCALE_INTENSITIES
+        self._staticGrayscaleLUT = np.array(
+            [0, i[self.CHANNEL_PLATFORMS], i[self.CHANNEL_EXITS], i[self.CHANNEL_EXITS]], dtype=np.uint8)
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        """
+        :return: the shape of the observation
+        """
+        return self._obs.shape
+
+    def reset(self, game) -> np.ndarray:
+        """
+        Renders the current state of the game and fills the entire frame stack with it (as required at the
+        beginning of an episode)
+
+        :param game: the game
+        :return: the observation; note that the array is reused (overwritten) by subsequent calls
+        """
+        self._renderFrame(game, self._frames[-1])
+        for i in range(self.numFrames - 1):
+            self._frames[i] = self._frames[-1]
+        return self._obs
+
+    def render(self, game) -> np.ndarray:
+        """
+        Renders the current state of the game, adding it to the frame stack (discarding the oldest frame)
+
+        :param game: the game
+        :return: the observation; note that the array is reused (overwritten) by subsequent calls
+        """
+        for i in range(self.numFrames - 1):
+            self._frames[i] = self._frames[i + 1]
+        self._renderFrame(game, self._frames[-1])
+        return self._obs
+
+    def _renderFrame(self, game, frame: np.ndarray):
+        raster = game.level.getRaster(self.scale)
+        width, height = self.width, self.height
+
+        # window (in raster coordinates) centred on the avatar
+        ax, ay = raster.rasterBounds(*game.avatar.pos)[:2]
+        wx, wy = ax - width // 2, ay - height // 2
+
+        # static objects: copy the part of the raster that lies within the window
+        ydim, xdim = raster.shape
+        x0, x1 = max(wx, 0), min(wx + width, xdim)
+        y0, y1 = max(wy, 0), min(wy + height, ydim)
+        static = self._staticFrame
+        if x0 != wx or y0 != wy or x1 != wx + width or y1 != wy + height:
+            static.fill(0)
+        if x0 < x1 and y0 < y1:
+            static[:, y0-wy:y1-wy, x0-wx:x1-wx] = raster.channels[:, y0:y1, x0:x1]
+        if self.grayscale:
+            codes = self._staticCodes
+            np.multiply(static[self.CHANNEL_EXITS], 2, out=codes)
+            np.add(codes, static[self.CHANNEL_PLATFORMS], out=codes)
+            np.take(self._staticGrayscaleLUT, codes, out=frame[0])
+        else:
+            np.multiply(static, 255, out=frame[:LevelRaster.NUM_CHANNELS])
+            frame[LevelRaster.NUM_CHANNELS:] = 0
+
+        # dynamic objects (drawing the avatar last)
+        for s in game.dynamicSprites:
+            if s is not game.avatar:
+                self._drawObject(frame, raster, s, self.CHANNEL_OTHERS, wx, wy)
+        self._drawObject(frame, raster, game.avatar, self.CHANNEL_AVATAR, wx, wy)
+
+    def _drawObject(self, frame: np.ndarray, raster: LevelRaster, s, channel: int, wx: int, wy: int):
+        width, height = self.width, self.height
+        r = s.worldRect()
+        rx0, ry0, rx1, ry1 = raster.rasterBounds(r.left, r.top, r.right, r.bottom)
+        rx0, rx1 = max(rx0 - wx, 0), min(rx1 - wx, width)
+        ry0, ry1 = max(ry0 - wy, 0), min(ry1 - wy, height)
+        if rx0 < rx1 and ry0 < ry1:
+            if self.grayscale:
+                frame[0, ry0:ry1, rx0:rx1] = self.GRAYSCALE_INTENSITIES[channel]
+            else:
+                frame[channel, ry0:ry1, rx0:rx1] = 255
@@ -0,0 +1,145 @@
+import csv
+import json
+from collections import deque, defaultdict
+from time import perf_counter
+from typing import Dict, Deque, Iterable, Tuple, Type, List
+
+import numpy as np
+
+
+class FrameProfiler:
+    """
+    Records the wall time spent in the phases of each frame (event dispatch, physics, sprite updates, rendering and
+    waiting for the next frame) as well as the update cost per sprite class, keeping the values of the most recent
+    frames in order to compute rolling statistics
+    """
+    PHASE_EVENTS = "events"
+    PHASE_PHYSICS = "physics"
+    PHASE_SPRITES = "sprites"
+    PHASE_RENDER = "render"
+    PHASE_TICK = "tick"
+    PHASES = (PHASE_EVENTS, PHASE_PHYSICS, PHASE_SPRITES, PHASE_RENDER, PHASE_TICK)
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self, windowSize: int = 1000, physicsSpriteTypes: Tuple[Type, ...] = ()):
+        """
+        :param windowSize: the number of most recent frames from which statistics are computed
+        :param physicsSpriteTypes: the sprite types whose updates are attributed to the physics phase (rather than
+            the sprite update phase)
+        """
+        self.windowSize = windowSize
+        self.physicsSpriteTypes = physicsSpriteTypes
+        self.reset()
+
+    def record(self, phase: str, seconds: float):
+        """
+        Adds time spent in the given phase to the current frame
+
+        :param phase: the phase (one of PHASES)
+        :param seconds: the wall time in seconds
+        """
+        self._currentPhaseTimes[phase] += seconds
+
+    def profileSpriteUpdates(self, sprites: Iterable, *args):
+        """
+        Updates the given sprites (like pygame's Group.update), recording the time spent per sprite class
+
+        :param sprites: the sprites to update
+        :param args: the arguments to pass to each sprite's update method
+        """
+        physicsSpriteTypes = self.physicsSpriteTypes
+        spriteClassTimes = self._currentSpriteClassTimes
+        physicsTime = 0.0
+        for sprite in sprites:
+            t = perf_counter()
+            sprite.update(*args)
+            duration = perf_counter() - t
+            spriteClassTimes[sprite.__class__.__name__] += duration
+            if isinstance(sprite, physicsSpriteTypes):
+                physicsTime += duration
+        self._currentPhaseTimes[self.PHASE_PHYSICS] += physicsTime
+        self._currentPhaseTimes[self.PHASE_SPRITES] -= physicsTime  # sprite phase time is recorded by the caller
+
+    def endFrame(self):
+        """
+        Completes the current frame, adding its values to the rolling windows
+        """
+        total = 0.0
+        for phase in self.PHASES:
+            value = self._currentPhaseTimes.get(phase, 0.0)
+            self.phaseTimes[phase].append(value)
+            total += value
+        self.frameTimes.append(total)
+        for cls, value in self._currentSpriteClassTimes.items():
+            times = self.spriteClassTimes.get(cls)
+            if times is None:
+                times = self.spriteClassTimes[cls] = deque(maxlen=self.windowSize)
+            times.append(value)
+        self._currentPhaseTimes.clear()
+        self._currentSpriteClassTimes.clear()
+        self.numFrames += 1
+
+    def reset(self):
+        """
+        Discards all recorded values
+        """
+        self.numFrames = 0
+        self.phaseTimes: Dict[str, Deque[float]] = {phase: deque(maxlen=self.windowSize) for phase in self.PHASES}
+        self.frameTimes: Deque[float] = deque(maxlen=self.windowSize)
+        self.spriteClassTimes: Dict[str, Deque[float]] = {}
+        self._currentPhaseTimes: Dict[str, float] = defaultdict(float)
+        self._currentSpriteClassTimes: Dict[str, float] = defaultdict(float)
+
+    @classmethod
+    def _statistics(cls, values: Iterable[float]) -> Dict[str, float]:
+        a = np.array(values) * 1000
+        stats = {"count": len(a)}
+        if len(a) == 0:
+            return stats
+        stats["mean_ms"] = float(a.mean())
+        for p, value in zip(cls.PERCENTILES, np.percentile(a, cls.PERCENTILES)):
+            stats[f"p{p}_ms"] = float(value)
+        stats["max_ms"] = float(a.max())
+        return stats
+
+    def summary(self) -> dict:
+        """
+        :return: a dictionary with rolling statistics (in milliseconds) over the most recent frames for the frame
+            time, each phase and each sprite class
+        """
+        return {
+            "numFrames": self.numFrames,
+            "windowSize": self.windowSize,
+            "frame": self._statistics(self.frameTimes),
+            "phases": {phase: self._statistics(times) for phase, times in self.phaseTimes.items()},
+            "spriteClasses": {cls: self._statistics(times) for cls, times in sorted(self.spriteClassTimes.items())},
+        }
+
+    def _summaryRows(self) -> List[dict]:
+        summary = self.summary()
+        rows = [dict(category="frame", name="total", **summary["frame"])]
+        for category, key in (("phase", "phases"), ("spriteClass", "spriteClasses")):
+            for name, stats in summary[key].items():
+                rows.append(dict(category=category, name=name, **stats))
+        return rows
+
+    def saveJSON(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def saveCSV(self, path: str):
+        rows = self._summaryRows()
+        fieldnames = ["category", "name", "count", "mean_ms"] + [f"p{p}_ms" for p in self.PERCENTILES] + ["max_ms"]
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def save(self, path: str):
+        """
+        Saves the summary to the given file, using CSV format if the path ends with ".csv" and JSON format otherwise
+        """
+        if path.endswith(".csv"):
+            self.saveCSV(path)
+        else:
+            self.saveJSON(path)
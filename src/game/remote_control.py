@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Sequence, Iterable, Optional
+from typing import Sequence, Iterable, Optional, NamedTuple
 
 import pygame
 
@@ -27,6 +27,16 @@ class VirtualKeyboard:
         return events
 
 
+class RemoteControls(NamedTuple):
+    """
+    The state of the avatar's controls
+    """
+    left: bool
+    right: bool
+    jump: bool
+    run: bool = False
+
+
 class RemoteAction(Enum):
     NONE = "none"
     LEFT = "left"
@@ -45,6 +55,16 @@ class RemoteAction(Enum):
             RemoteAction.RIGHT_UP: [pygame.K_RIGHT, pygame.K_UP],
         }[self]
 
+    def getControls(self) -> RemoteControls:
+        """
+        :return: the state of the controls corresponding to the keys pressed for this action
+        """
+        return _remoteActionControls[self]
+
+
+_remoteActionControls = {a: RemoteControls(left=pygame.K_LEFT in a.getKeys(), right=pygame.K_RIGHT in a.getKeys(),
+    jump=pygame.K_UP in a.getKeys()) for a in RemoteAction}
+
 
 class RemoteActionEventGenerator:
     def __init__(self):
@@ -63,7 +83,17 @@ class RemoteController(ABC):
     def _chooseAction(self) -> RemoteAction:
         pass
 
+    def chooseAction(self) -> RemoteAction:
+        """
+        :return: the action to apply in the current time step (to be passed on to ControlledAvatar.applyAction)
+        """
+        return self._chooseAction()
+
     def generateEvents(self) -> list:
+        """
+        :return: the key events which implement the action for the current time step (for the event-based control
+            path, which is equivalent to ControlledAvatar.applyAction)
+        """
         action = self._chooseAction()
         return self.eventGen.actionToEvents(action)
 
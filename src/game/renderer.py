@@ -1,6 +1,12 @@
+import math
 import os
+from collections import defaultdict, OrderedDict
+from enum import Enum
+from typing import Optional, Dict, Tuple, List, Set, Sequence
+
 import pygame
 from pygame import sprite
+from .assets import getAssetCache
 from .events import EventHandler
 
 SpriteLayer = {} # TODO use it
@@ -45,23 +51,214 @@ class SpriteGroup(sprite.Group, HierarchicalGroup):
         HierarchicalGroup.add(self, *spritesAndGroups)
 
 
+class RenderMode(Enum):
+    FULL = "full"
+    """
+    clears and redraws all sprites in each frame and presents the entire display
+    """
+    CULLED = "culled"
+    """
+    draws the level's pre-rendered static layer (see StaticLevelLayer) within the camera viewport followed by the
+    dynamic sprites, restoring the background only in the regions drawn in the previous frame, and presents only the
+    changed regions (once per frame); unlike in FULL mode, invisible platforms are not drawn
+    """
+
+
+class StaticLevelLayer(object):
+    """
+    A pre-rendered image of a level's static sprites (platforms and exits), which is partitioned into square
+    world-space chunks. Chunks are rendered when they first become visible and are cached (up to a maximum number),
+    such that the cost of drawing the level depends on the number of chunks within the viewport rather than on the
+    number of sprites. The chunks overlapping a platform are invalidated when the platform's visibility changes.
+    """
+    CHUNK_SIZE = 512
+    MAX_CACHED_CHUNKS = 64
+    COLOR_KEY = (255, 0, 255)
+
+    def __init__(self, sprites: Sequence[sprite.Sprite], chunkSize: int = CHUNK_SIZE,
+            maxCachedChunks: int = MAX_CACHED_CHUNKS):
+        """
+        :param sprites: the static sprites (in drawing order); sprites with a visible attribute are drawn only if
+            they are visible
+        :param chunkSize: the side length of a chunk in pixels
+        :param maxCachedChunks: the maximum number of rendered chunks to keep (least recently drawn chunks are
+            discarded first); should be larger than the number of chunks within the viewport
+        """
+        self.chunkSize = chunkSize
+        self.maxCachedChunks = maxCachedChunks
+        self._chunkSprites: Dict[Tuple[int, int], List[sprite.Sprite]] = defaultdict(list)
+        for s in sprites:
+            for key in self._chunkKeys(s.worldRect()):
+                self._chunkSprites[key].append(s)
+        self._chunkSprites = dict(self._chunkSprites)
+        self._chunks: "OrderedDict[Tuple[int, int], pygame.Surface]" = OrderedDict()
+        self._rect = pygame.Rect(0, 0, chunkSize, chunkSize)
+
+    def _chunkKeys(self, rect: pygame.Rect) -> List[Tuple[int, int]]:
+        size = self.chunkSize
+        return [(cx, cy) for cx in range(rect.left // size, (rect.right - 1) // size + 1)
+            for cy in range(rect.top // size, (rect.bottom - 1) // size + 1)]
+
+    def invalidate(self, s: sprite.Sprite):
+        """
+        Discards the rendered chunks overlapping the given sprite, such that they are rendered anew when drawn next
+
+        :param s: a static sprite whose appearance changed
+        """
+        for key in self._chunkKeys(s.worldRect()):
+            self._chunks.pop(key, None)
+
+    def _renderChunk(self, key: Tuple[int, int]) -> pygame.Surface:
+        size = self.chunkSize
+        x0, y0 = key[0] * size, key[1] * size
+        sprites = [s for s in self._chunkSprites[key] if s.image is not None and getattr(s, "visible", True)]
+        # use per-pixel alpha only if required, as blitting colour-keyed surfaces is considerably faster
+        if any(s.image.get_flags() & pygame.SRCALPHA for s in sprites):
+            chunk = pygame.Surface((size, size), pygame.SRCALPHA).convert_alpha()
+            chunk.fill((0, 0, 0, 0))
+        else:
+            chunk = pygame.Surface((size, size)).convert()
+            chunk.fill(self.COLOR_KEY)
+            chunk.set_colorkey(self.COLOR_KEY, pygame.RLEACCEL)
+        for s in sprites:
+            r = s.worldRect()
+            chunk.blit(s.image, (r.left - x0, r.top - y0))
+        return chunk
+
+    def draw(self, surface: pygame.Surface, cameraPos) -> List[pygame.Rect]:
+        """
+        Draws the chunks within the viewport
+
+        :param surface: the surface to draw to, whose top-left corner corresponds to the camera position
+        :param cameraPos: the world coordinates of the camera position
+        :return: the (clipped) regions of the surface that were drawn to
+        """
+        size = self.chunkSize
+        width, height = surface.get_size()
+        left, top = int(math.floor(cameraPos[0])), int(math.floor(cameraPos[1]))
+        rect = self._rect
+        drawnRects = []
+        for cx in range(left // size, (left + width) // size + 1):
+            for cy in range(top // size, (top + height) // size + 1):
+                key = (cx, cy)
+                if key not in self._chunkSprites:
+                    continue
+                chunk = self._chunks.get(key)
+                if chunk is None:
+                    chunk = self._chunks[key] = self._renderChunk(key)
+                    if len(self._chunks) > self.maxCachedChunks:
+                        self._chunks.popitem(last=False)
+                else:
+                    self._chunks.move_to_end(key)
+                rect.topleft = (cx * size - cameraPos[0], cy * size - cameraPos[1])
+                drawnRects.append(surface.blit(chunk, rect))
+        return drawnRects
+
+
 class GameRenderer(LayeredRenderer):
     ''' the main game renderer '''
+
+    VISIBILITY_BUCKET_SIZE = 256  # the side length of the buckets in which static sprites are registered for culling
     
     def __init__(self, game):
+        self._staticSpriteBuckets: Optional[Dict[Tuple[int, int], List[sprite.Sprite]]] = None
+        self._visibleStaticSprites: Set[sprite.Sprite] = set()
+        self._drawnRects: Optional[List[pygame.Rect]] = None  # the regions drawn in the previous frame (culled mode)
         LayeredRenderer.__init__(self)
         
         self.game = game
         self.screen = game.screen
+        self.background = None
+        self.mode = game.renderMode
         
-        self.background = pygame.image.load(os.path.join('assets', 'images', 'background2.png')).convert()
-        self.background = pygame.transform.scale(self.background, (game.width, game.height))
+        if game.enableRendering:
+            self.background = getAssetCache().image(os.path.join('assets', 'images', 'background2.png'),
+                size=(game.width, game.height), alpha=False)
         
-        self.screen.blit(self.background, [0,0])
+            self.screen.blit(self.background, [0,0])
     
+    def add(self, *spritesAndGroups):
+        LayeredRenderer.add(self, *spritesAndGroups)
+        self._staticSpriteBuckets = None
+
+    def _staticSprites(self) -> List[sprite.Sprite]:
+        return [s for s in self.sprites() if getattr(s, "isStatic", False)]
+
+    def _createStaticSpriteBuckets(self) -> Dict[Tuple[int, int], List[sprite.Sprite]]:
+        size = self.VISIBILITY_BUCKET_SIZE
+        buckets = defaultdict(list)
+        for s in self._staticSprites():
+            r = s.worldRect()
+            for bx in range(r.left // size, (r.right - 1) // size + 1):
+                for by in range(r.top // size, (r.bottom - 1) // size + 1):
+                    buckets[(bx, by)].append(s)
+        return dict(buckets)
+
+    def _updateIndex(self, game):
+        if self._staticSpriteBuckets is None:
+            self._staticSpriteBuckets = self._createStaticSpriteBuckets()
+            for s in self._staticSprites():
+                s.updateScreenRect(game)
+            self._visibleStaticSprites = set()
+
+    def updateScreenRects(self, game):
+        ''' updates the drawing positions of the sprites relative to the camera: dynamic sprites are always
+        updated; in FULL mode, static sprites are updated only if they are (or, in the previous frame, were) within
+        the viewport, such that static sprites outside of the viewport retain drawing positions outside of the
+        screen; in CULLED mode, static sprites are drawn via the level's static layer and are not updated at all '''
+        if self.mode == RenderMode.CULLED:
+            for s in game.dynamicSprites:
+                s.updateScreenRect(game)
+            return
+
+        self._updateIndex(game)
+
+        # determine the static sprites in the buckets overlapping the viewport (with a margin for rounding)
+        size = self.VISIBILITY_BUCKET_SIZE
+        left, top = int(math.floor(game.camera.pos[0])) - 1, int(math.floor(game.camera.pos[1])) - 1
+        right, bottom = left + game.width + 2, top + game.height + 2
+        visible = set()
+        for bx in range(left // size, right // size + 1):
+            for by in range(top // size, bottom // size + 1):
+                bucket = self._staticSpriteBuckets.get((bx, by))
+                if bucket is not None:
+                    visible.update(bucket)
+
+        for s in visible.union(self._visibleStaticSprites):
+            s.updateScreenRect(game)
+        for s in game.dynamicSprites:
+            s.updateScreenRect(game)
+        self._visibleStaticSprites = visible
+
     def draw(self):
-        self.clear(self.screen, self.background)
-        things = sprite.LayeredUpdates.draw(self, self.screen)
-        pygame.display.update(things)
-        pygame.display.flip()
+        if self.mode == RenderMode.CULLED:
+            self._drawCulled()
+        else:
+            self.clear(self.screen, self.background)
+            things = sprite.LayeredUpdates.draw(self, self.screen)
+            pygame.display.update(things)
+            pygame.display.flip()
+
+    def _drawCulled(self):
+        game = self.game
+        screen = self.screen
+        background = self.background
+
+        # restore the background in the regions drawn in the previous frame
+        if self._drawnRects is not None:
+            for r in self._drawnRects:
+                screen.blit(background, r, r)
+
+        # draw the static layer followed by the dynamic sprites (in the order in which they were added)
+        drawnRects = game.level.getStaticLayer().draw(screen, game.camera.pos)
+        for s in game.dynamicSprites:
+            if s.image is not None:
+                drawnRects.append(screen.blit(s.image, s.rect))
+
+        # present the changed regions
+        if self._drawnRects is None:  # first frame: the entire screen (including the initial background) changed
+            pygame.display.update()
+        else:
+            pygame.display.update(self._drawnRects + drawnRects)
+        self._drawnRects = drawnRects
     
\ No newline at end of file
@@ -0,0 +1,260 @@
+import multiprocessing
+import os
+from multiprocessing.connection import Connection
+from time import perf_counter
+from typing import List, Optional, Sequence, Tuple, NamedTuple
+
+import numpy as np
+
+from game import Game, config
+from game.debug import getLogger
+from game.remote_control import RemoteAction, RemoteController
+
+log = getLogger(__name__)
+
+
+class CandidateStatistics(NamedTuple):
+    """
+    The results of the rollouts that started with a candidate action
+    """
+    numRollouts: int
+    sumReturn: float
+    maxReturn: float
+
+    def merge(self, other: "CandidateStatistics") -> "CandidateStatistics":
+        return CandidateStatistics(self.numRollouts + other.numRollouts, self.sumReturn + other.sumReturn,
+            max(self.maxReturn, other.maxReturn))
+
+    def meanReturn(self) -> float:
+        return self.sumReturn / self.numRollouts if self.numRollouts > 0 else -np.inf
+
+
+class PlanningRequest(NamedTuple):
+    """
+    A request to a rollout worker to synchronise its game with the controlled game and to evaluate candidate actions
+    """
+    levelPath: str
+    episode: int
+    newActions: Tuple[int, ...]  # the indices of the actions applied in the controlled game since the last request
+    horizon: int
+    actionRepeat: int
+    timeBudget: float
+    maxRollouts: Optional[int]
+
+
+class RolloutWorker:
+    """
+    Maintains a headless copy of the controlled game, which is kept in sync by replaying the actions applied in the
+    controlled game (the simulation being deterministic), and evaluates candidate actions via Monte-Carlo rollouts,
+    restoring the game state (see Game.saveState) after each rollout
+    """
+    def __init__(self, seed: Optional[int] = None):
+        self.game: Optional[Game] = None
+        self.levelPath: Optional[str] = None
+        self.episode: Optional[int] = None
+        self.actions = list(RemoteAction)
+        self.rand = np.random.RandomState(seed)
+
+    def _step(self, actionIdx: int):
+        game = self.game
+        game.avatar.applyAction(self.actions[actionIdx])
+        game.processDataStreams()
+        game.update()
+
+    def sync(self, levelPath: str, episode: int, newActions: Sequence[int]):
+        """
+        :param levelPath: the path of the level being played
+        :param episode: the episode number (which changes whenever the level is (re)started)
+        :param newActions: the indices of the actions applied (one per frame) since the previous synchronisation
+        """
+        if levelPath != self.levelPath:
+            self.game = Game([os.path.relpath(levelPath, config.levelsPath)], enableRendering=False, fastMotion=True)
+            self.levelPath = levelPath
+        elif episode != self.episode:
+            self.game.resetLevel()
+        self.episode = episode
+        for actionIdx in newActions:
+            self._step(actionIdx)
+
+    def _rollout(self, firstActionIdx: int, horizon: int, actionRepeat: int) -> float:
+        game = self.game
+        initialScore = game.score
+        actionIdx = firstActionIdx
+        for i in range(horizon):
+            if i > 0:
+                actionIdx = self.rand.randint(len(self.actions))
+            for _ in range(actionRepeat):
+                self._step(actionIdx)
+                if game.levelStatus.isOver():
+                    return game.score - initialScore
+        return game.score - initialScore
+
+    def evaluate(self, horizon: int, actionRepeat: int, timeBudget: float, maxRollouts: Optional[int] = None) \
+            -> List[CandidateStatistics]:
+        """
+        Evaluates each action (as the first action of a rollout) by performing rollouts from the current state in
+        a round-robin fashion until the time budget is exhausted (but at least one rollout per action)
+
+        :param horizon: the number of decisions per rollout, the actions after the first being chosen at random
+        :param actionRepeat: the number of frames for which each action is applied
+        :param timeBudget: the time budget in seconds
+        :param maxRollouts: the maximum number of rollouts per action; if None, the number is unlimited
+        :return: the statistics for each action (in the order of RemoteAction)
+        """
+        t = perf_counter()
+        game = self.game
+        rootState = game.saveState()
+        returns = [[] for _ in self.actions]
+        numRollouts = 0
+        while maxRollouts is None or numRollouts < maxRollouts:
+            if numRollouts > 0 and perf_counter() - t > timeBudget:
+                break
+            for actionIdx in range(len(self.actions)):
+                returns[actionIdx].append(self._rollout(actionIdx, horizon, actionRepeat))
+                game.restoreState(rootState)
+            numRollouts += 1
+        return [CandidateStatistics(len(r), float(sum(r)), float(max(r))) for r in returns]
+
+    def plan(self, request: PlanningRequest) -> List[CandidateStatistics]:
+        self.sync(request.levelPath, request.episode, request.newActions)
+        return self.evaluate(request.horizon, request.actionRepeat, request.timeBudget, request.maxRollouts)
+
+
+def _workerMain(conn: Connection, seed: int):
+    worker = RolloutWorker(seed=seed)
+    while True:
+        cmd, data = conn.recv()
+        if cmd == "plan":
+            conn.send(worker.plan(data))
+        elif cmd == "close":
+            conn.close()
+            break
+
+
+class RolloutWorkerPool:
+    """
+    A pool of worker processes, each of which holds a RolloutWorker, to which the same planning requests are sent,
+    such that rollouts are performed in parallel
+    """
+    def __init__(self, numWorkers: int, seed: int = 0):
+        ctx = multiprocessing.get_context("spawn")
+        self.connections: List[Connection] = []
+        self.processes = []
+        for i in range(numWorkers):
+            conn, workerConn = ctx.Pipe()
+            process = ctx.Process(target=_workerMain, args=(workerConn, seed + i), daemon=True)
+            process.start()
+            workerConn.close()
+            self.connections.append(conn)
+            self.processes.append(process)
+
+    def plan(self, request: PlanningRequest) -> List[List[CandidateStatistics]]:
+        """
+        :param request: the request
+        :return: the list of results of the individual workers
+        """
+        for conn in self.connections:
+            conn.send(("plan", request))
+        return [conn.recv() for conn in self.connections]
+
+    def close(self):
+        for conn in self.connections:
+            conn.send(("close", None))
+            conn.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+
+class RolloutPlanningController(RemoteController):
+    """
+    A planning controller, which chooses actions by evaluating each action via Monte-Carlo rollouts (continuing
+    with random actions up to a fixed horizon) in headless copies of the game, which are kept in sync with the
+    controlled game. Rollouts are spread over a pool of worker processes (or performed in the controller's process)
+    and are limited by a per-decision time budget.
+    Since the simulation is deterministic, the maximum return of an action's rollouts is a return that is actually
+    achievable; it is therefore used to rank actions by default.
+    """
+    AGGREGATE_MAX = "max"
+    AGGREGATE_MEAN = "mean"
+
+    def __init__(self, game: Game, numWorkers: int = 0, horizon: int = 10, actionRepeat: int = 4,
+            timeBudget: float = 0.05, maxRollouts: Optional[int] = None, aggregate: str = AGGREGATE_MAX,
+            seed: int = 0):
+        """
+        :param game: the controlled game (whose levels must have been loaded from files)
+        :param numWorkers: the number of worker processes; if 0, perform the rollouts in this process
+        :param horizon: the number of decisions per rollout
+        :param actionRepeat: the number of frames for which each action is applied (in rollouts and in the
+            controlled game), i.e. a decision is made every actionRepeat frames
+        :param timeBudget: the time budget (in seconds) per decision for the rollouts of each worker
+        :param maxRollouts: the maximum number of rollouts per action and worker; if None, the number is limited
+            only by the time budget
+        :param aggregate: the aggregation of an action's rollout returns with which actions are ranked
+            (AGGREGATE_MAX or AGGREGATE_MEAN)
+        :param seed: the random seed
+        """
+        if aggregate not in (self.AGGREGATE_MAX, self.AGGREGATE_MEAN):
+            raise ValueError(f"Unknown aggregate '{aggregate}'")
+        self.game = game
+        self.horizon = horizon
+        self.actionRepeat = actionRepeat
+        self.timeBudget = timeBudget
+        self.maxRollouts = maxRollouts
+        self.aggregate = aggregate
+        self.actions = list(RemoteAction)
+        self.rand = np.random.RandomState(seed)
+        self.episode = -1
+        self.lastStatistics: Optional[List[CandidateStatistics]] = None  # the statistics of the most recent decision
+        self.pool = RolloutWorkerPool(numWorkers, seed=seed + 1) if numWorkers > 0 else None
+        self.localWorker = RolloutWorker(seed=seed + 1) if numWorkers == 0 else None
+        super().__init__()
+
+    def reset(self):
+        super().reset()
+        self.episode += 1
+        self._episodeActions: List[int] = []  # the indices of the actions applied in the current episode
+        self._numSyncedActions = 0
+        self._actionIdx = 0
+        self._numRemainingFrames = 0
+
+    def _plan(self) -> int:
+        levelPath = self.game.level.path
+        if levelPath is None:
+            raise ValueError("Planning requires levels that were loaded from files")
+        request = PlanningRequest(levelPath, self.episode, tuple(self._episodeActions[self._numSyncedActions:]),
+            self.horizon, self.actionRepeat, self.timeBudget, self.maxRollouts)
+        self._numSyncedActions = len(self._episodeActions)
+        if self.pool is not None:
+            results = self.pool.plan(request)
+        else:
+            results = [self.localWorker.plan(request)]
+        statistics = results[0]
+        for result in results[1:]:
+            statistics = [s.merge(r) for s, r in zip(statistics, result)]
+        self.lastStatistics = statistics
+        if self.aggregate == self.AGGREGATE_MAX:
+            values = np.array([s.maxReturn for s in statistics])
+        else:
+            values = np.array([s.meanReturn() for s in statistics])
+        bestIndices = np.flatnonzero(values == values.max())
+        actionIdx = int(self.rand.choice(bestIndices))
+        log.debug("Planned action", self.actions[actionIdx], "values:", values, "rollouts:",
+            sum(s.numRollouts for s in statistics))
+        return actionIdx
+
+    def _chooseAction(self) -> RemoteAction:
+        if self._numRemainingFrames == 0:
+            self._actionIdx = self._plan()
+            self._numRemainingFrames = self.actionRepeat
+        self._numRemainingFrames -= 1
+        self._episodeActions.append(self._actionIdx)
+        return self.actions[self._actionIdx]
+
+    def close(self):
+        """
+        Terminates the worker processes (if any)
+        """
+        if self.pool is not None:
+            self.pool.close()
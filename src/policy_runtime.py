@@ -0,0 +1,172 @@
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from game import Game
+from game.debug import getLogger
+from game.observation import FeatureObservationBuilder
+from game.remote_control import RemoteAction, RemoteController
+
+log = getLogger(__name__)
+
+
+ACTIVATIONS = {
+    "identity": lambda x: x,
+    "tanh": np.tanh,
+    "relu": lambda x: np.maximum(x, 0),
+}
+"""
+the supported activation functions (applied to the outputs of the layers of a NumpyPolicy) by name
+"""
+
+
+class NumpyPolicy:
+    """
+    A categorical MLP policy (such as the policy network of a stable_baselines3 MlpPolicy with a discrete action space)
+    whose forward pass is computed with NumPy alone, such that a trained policy can be applied without importing
+    torch, stable_baselines3 or gym. Policies are created from trained models via DeepRLAgent.exportPolicy and are
+    stored as .npz array files.
+    """
+    FORMAT_VERSION = 1
+
+    def __init__(self, weights: Sequence[np.ndarray], biases: Sequence[np.ndarray], activations: Sequence[str],
+            observationShape: Sequence[int], observationScale: float = 1.0, gridContext: Optional[int] = None,
+            actionRepeat: int = 1, seed: Optional[int] = None):
+        """
+        :param weights: the weight matrices of the linear layers (each of shape (outputDim, inputDim)), the last
+            layer's outputs being the action logits
+        :param biases: the bias vectors of the linear layers
+        :param activations: the names of the activation functions applied to the outputs of the linear layers
+            (see ACTIVATIONS)
+        :param observationShape: the shape of a single observation (which is flattened for the first layer)
+        :param observationScale: the factor with which observations are multiplied before the first layer
+        :param gridContext: the grid context of the feature observations the policy was trained with (see
+            FeatureObservationBuilder); None if the policy was trained with other observations
+        :param actionRepeat: the number of frames for which each action was applied in training
+        :param seed: the random seed for the sampling of actions
+        """
+        if not (len(weights) == len(biases) == len(activations)):
+            raise ValueError("The numbers of weights, biases and activations must match")
+        for a in activations:
+            if a not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation '{a}'")
+        self.weights = [np.ascontiguousarray(w.T, dtype=np.float32) for w in weights]  # stored as (inputDim, outputDim)
+        self.biases = [np.asarray(b, dtype=np.float32) for b in biases]
+        self.activations = list(activations)
+        self._activationFns = [ACTIVATIONS[a] for a in activations]
+        self.observationShape = tuple(int(d) for d in observationShape)
+        self.observationScale = float(observationScale)
+        self.gridContext = gridContext
+        self.actionRepeat = int(actionRepeat)
+        self.numActions = self.biases[-1].shape[0]
+        self.rand = np.random.RandomState(seed)
+
+    @classmethod
+    def load(cls, path: str, seed: Optional[int] = None) -> "NumpyPolicy":
+        """
+        :param path: the path of the .npz file (see save)
+        :param seed: the random seed for the sampling of actions
+        :return: the policy
+        """
+        with np.load(path) as data:
+            version = int(data["formatVersion"])
+            if version != cls.FORMAT_VERSION:
+                raise ValueError(f"Unsupported policy format version {version} in {path}")
+            numLayers = len(data["activations"])
+            gridContext = int(data["gridContext"])
+            weights = [data[f"weights{i}"] for i in range(numLayers)]
+            biases = [data[f"biases{i}"] for i in range(numLayers)]
+            policy = cls(weights, biases, [str(a) for a in data["activations"]], data["observationShape"],
+                observationScale=float(data["observationScale"]), gridContext=gridContext if gridContext >= 0 else None,
+                actionRepeat=int(data["actionRepeat"]), seed=seed)
+        log("Loaded policy from", path, "with layer sizes", [w.shape[1] for w in policy.weights])
+        return policy
+
+    def save(self, path: str):
+        """
+        Saves the policy to an uncompressed .npz array file
+
+        :param path: the file path
+        """
+        arrays = dict(formatVersion=np.array(self.FORMAT_VERSION), activations=np.array(self.activations),
+            observationShape=np.array(self.observationShape), observationScale=np.array(self.observationScale),
+            gridContext=np.array(self.gridContext if self.gridContext is not None else -1),
+            actionRepeat=np.array(self.actionRepeat))
+        for i, (w, b) in enumerate(zip(self.weights, self.biases)):
+            arrays[f"weights{i}"] = w.T
+            arrays[f"biases{i}"] = b
+        np.savez(path, **arrays)
+
+    def logits(self, obs: np.ndarray) -> np.ndarray:
+        """
+        :param obs: a batch of observations of shape (N, *observationShape)
+        :return: the action logits of shape (N, numActions)
+        """
+        x = obs.reshape((obs.shape[0], -1)).astype(np.float32)
+        if self.observationScale != 1.0:
+            x *= self.observationScale
+        for w, b, activation in zip(self.weights, self.biases, self._activationFns):
+            x = activation(x @ w + b)
+        return x
+
+    def predict(self, obs: np.ndarray, deterministic=True) -> Tuple[Union[int, np.ndarray], None]:
+        """
+        Chooses actions (with the same interface as stable_baselines3's predict, such that the policy can be used in
+        place of a model, e.g. in a PolicyInferenceService)
+
+        :param obs: a single observation or a batch of observations
+        :param deterministic: whether to choose the most probable actions rather than to sample actions
+        :return: a pair (actions, None), where actions is the action index for a single observation and the array of
+            action indices for a batch
+        """
+        obs = np.asarray(obs)
+        isSingle = obs.shape == self.observationShape
+        logits = self.logits(obs[np.newaxis] if isSingle else obs)
+        if deterministic:
+            actions = logits.argmax(axis=1)
+        else:
+            p = np.exp(logits - logits.max(axis=1, keepdims=True))
+            cdf = np.cumsum(p, axis=1)
+            u = self.rand.random_sample((len(cdf), 1)) * cdf[:, -1:]
+            actions = np.minimum((cdf < u).sum(axis=1), self.numActions - 1)
+        return (int(actions[0]) if isSingle else actions), None
+
+
+class NumpyPolicyRemoteController(RemoteController):
+    """
+    A controller which applies a NumpyPolicy trained with feature observations (see FeatureObservationBuilder),
+    holding each action for the policy's number of action repeat frames (like in training)
+    """
+    def __init__(self, game: Game, policy: NumpyPolicy, deterministic=True):
+        """
+        :param game: the game to control
+        :param policy: the policy
+        :param deterministic: whether to choose the most probable actions rather than to sample actions
+        """
+        if policy.gridContext is None:
+            raise ValueError("The policy was not trained with feature observations")
+        self.game = game
+        self.policy = policy
+        self.deterministic = deterministic
+        self.actions: List[RemoteAction] = list(RemoteAction)
+        self.featureObservation = FeatureObservationBuilder(policy.gridContext)
+        if policy.numActions != len(self.actions):
+            raise ValueError(f"The policy has {policy.numActions} actions, expected {len(self.actions)}")
+        if (self.featureObservation.size,) != policy.observationShape:
+            raise ValueError(f"The policy's observation shape {policy.observationShape} does not match the feature "
+                f"observation size {self.featureObservation.size}")
+        super().__init__()
+
+    def reset(self):
+        super().reset()
+        self._action: Optional[RemoteAction] = None
+        self._numRemainingFrames = 0
+
+    def _chooseAction(self) -> RemoteAction:
+        if self._numRemainingFrames == 0:
+            obs = self.featureObservation.build(self.game)
+            actionIdx, _ = self.policy.predict(obs, deterministic=self.deterministic)
+            self._action = self.actions[actionIdx]
+            self._numRemainingFrames = self.policy.actionRepeat
+        self._numRemainingFrames -= 1
+        return self._action